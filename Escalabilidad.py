@@ -1,9 +1,17 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import math
+
+from motor import (
+    COLUMNAS_IMPORTES, MAX_FIGURAS, MEDICOS_POR_PAGINA, almacen_sesion, cache_sesion, comparacion_largo,
+    figura_cacheada, panel_perfil, perfil_sesion
+)
 
 st.set_page_config(page_title="Escalabilidad", layout="wide", page_icon="📊")
 
+# Tiempos por sección de cada ejecución (panel "Perfil de ejecución" en la barra lateral)
+perfil = perfil_sesion(st.session_state, "escalabilidad_comparacion")
+perfil.seccion("Carga")
+
 st.markdown("## 📊 Escalabilidad del Sistema de Pago")
 st.write("""
 El sistema de pago funciona en **tres pasos muy simples**:
@@ -14,19 +22,22 @@ El sistema de pago funciona en **tres pasos muy simples**:
 """)
 
 # -------------------- Cargar DataFrame --------------------
-if "df_edit" not in st.session_state:
+# Distribución publicada por la página 'Distribución VITHAS-OSA' (sin copiarla)
+almacen = almacen_sesion(st.session_state)
+if not almacen:
     st.error("❌ No se han cargado datos aún. Por favor, primero use la página 'Distribución VITHAS-OSA'.")
     st.stop()
 
-df_edit = st.session_state["df_edit"].copy()
-servicios = st.session_state["servicios"]
+indice = almacen.resultados()["indice"]
+servicios = almacen.servicios
+st.caption(f"Datos del periodo {almacen.origen} (versión {almacen.version})")
 
 # -------------------- Selección de médicos --------------------
 st.markdown("### 👨‍⚕️ Seleccione médicos para ver el detalle")
 medicos_sel = st.multiselect(
     "Médicos:",
-    df_edit["Médico"].unique(),
-    default=[df_edit["Médico"].iloc[0]]
+    indice.medicos(),
+    default=indice.medicos()[:1]
 )
 
 if not medicos_sel:
@@ -34,34 +45,17 @@ if not medicos_sel:
     st.stop()
 
 # -------------------- Construcción de datos --------------------
-comparacion_data = []
-
-for medico_sel in medicos_sel:
-    row = df_edit[df_edit["Médico"] == medico_sel].iloc[0]
-
-    for s in servicios.keys():
-        fact = row[s]
-        vithas = fact * servicios[s]["VITHAS"]
-        osa = fact * servicios[s]["OSA"]
-        abonado = osa * row["Pct_Abono"]
-        comparacion_data.append({
-            "Médico": medico_sel,
-            "Servicio": s,
-            "Facturación": fact,
-            "VITHAS": vithas,
-            "OSA": osa,
-            "Abonado al Médico": abonado
-        })
-
-df_comp = pd.DataFrame(comparacion_data)
+perfil.seccion("Construcción de datos")
+# Formato largo médico × servicio de todos los seleccionados de una vez, con la
+# fila TOTAL de cada médico al final de su bloque
+df_comp = comparacion_largo(indice.filas(medicos_sel), servicios, totales=True)
+filas_por_medico = len(servicios) + 1
 
 # -------------------- Mostrar detalle por médico --------------------
+perfil.seccion("Detalle")
 st.markdown("### 📋 Detalle por Médico")
-for medico_sel in medicos_sel:
-    df_medico = df_comp[df_comp["Médico"] == medico_sel].copy()
-    df_medico.loc["TOTAL"] = df_medico[["Facturación", "VITHAS", "OSA", "Abonado al Médico"]].sum()
-    df_medico.loc["TOTAL", "Médico"] = medico_sel
-    df_medico.loc["TOTAL", "Servicio"] = "TOTAL"
+for k, medico_sel in enumerate(medicos_sel):
+    df_medico = df_comp.iloc[k * filas_por_medico:(k + 1) * filas_por_medico]
 
     st.subheader(f"👨‍⚕️ {medico_sel}")
     st.dataframe(
@@ -71,35 +65,69 @@ for medico_sel in medicos_sel:
             "OSA": "{:,.2f} €",
             "Abonado al Médico": "{:,.2f} €"
         }),
-        use_container_width=True
+        use_container_width=True,
+        hide_index=True
     )
 
 # -------------------- Gráfico comparativo --------------------
+perfil.seccion("Gráfico")
+import plotly.express as px
+
 st.markdown("### 📊 Comparación entre médicos")
 
-df_melt = df_comp.melt(
-    id_vars=["Médico", "Servicio"],
-    value_vars=["Facturación", "VITHAS", "OSA", "Abonado al Médico"],
-    var_name="Concepto",
-    value_name="Valor (€)"
-)
+# Una faceta por médico solo hasta MEDICOS_POR_PAGINA; con más se pagina (cada
+# página es un bloque contiguo de df_comp) o se suma la selección por servicio
+df_grafico = df_comp
+titulo_grafico = "Comparación de distribución por servicio y médico"
+facetas = True
+if len(medicos_sel) > MEDICOS_POR_PAGINA:
+    modo_grafico = st.radio(
+        f"{len(medicos_sel)} médicos seleccionados: modo del gráfico",
+        ["Por páginas", "Agregado (suma de la selección)"], horizontal=True, key="modo_grafico_comparacion"
+    )
+    if modo_grafico == "Por páginas":
+        paginas = math.ceil(len(medicos_sel) / MEDICOS_POR_PAGINA)
+        pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1, step=1,
+                                 key="pagina_grafico_comparacion")
+        inicio = (pagina - 1) * MEDICOS_POR_PAGINA * filas_por_medico
+        df_grafico = df_comp.iloc[inicio:inicio + MEDICOS_POR_PAGINA * filas_por_medico]
+    else:
+        df_grafico = df_comp.groupby("Servicio", sort=False, as_index=False)[COLUMNAS_IMPORTES].sum()
+        titulo_grafico = f"Distribución por servicio de los {len(medicos_sel)} médicos seleccionados"
+        facetas = False
+
+
+def figura_comparacion(df):
+    df_melt = df[df["Servicio"] != "TOTAL"].melt(
+        id_vars=["Médico", "Servicio"] if facetas else ["Servicio"],
+        value_vars=COLUMNAS_IMPORTES,
+        var_name="Concepto",
+        value_name="Valor (€)"
+    )
+    figura = px.bar(
+        df_melt,
+        x="Servicio",
+        y="Valor (€)",
+        color="Concepto",
+        barmode="group",
+        facet_col="Médico" if facetas else None,
+        facet_col_wrap=3 if facetas else 0,
+        text_auto=".2s",
+        title=titulo_grafico
+    )
+    figura.update_layout(yaxis_title="€", xaxis_title="Servicio")
+    return figura
 
-fig = px.bar(
-    df_melt,
-    x="Servicio",
-    y="Valor (€)",
-    color="Concepto",
-    barmode="group",
-    facet_col="Médico",
-    text_auto=".2s",
-    title="Comparación de distribución por servicio y médico"
-)
-fig.update_layout(yaxis_title="€", xaxis_title="Servicio")
+
+# Misma selección y mismos datos: se reutiliza la figura de la ejecución anterior
+cache_figuras = cache_sesion(st.session_state, "cache_figuras", max_entradas=MAX_FIGURAS)
+fig = figura_cacheada(cache_figuras, "comparacion_medicos", df_grafico, figura_comparacion, facetas, titulo_grafico)
 st.plotly_chart(fig, use_container_width=True)
 
 # -------------------- Conclusión --------------------
+perfil.seccion("Conclusión")
 for medico_sel in medicos_sel:
-    row = df_edit[df_edit["Médico"] == medico_sel].iloc[0]
+    row = indice.fila(medico_sel)
     st.success(f"""
     👉 **{medico_sel}** facturó un total bruto de **{row['Total_Bruto']:,.2f} €**.  
     - VITHAS se queda con su parte según servicio.  
@@ -107,3 +135,5 @@ for medico_sel in medicos_sel:
     - Finalmente, al médico se le abonó **{row['Abonado_a_Medico']:,.2f} €**  
       (**{row['Pct_Abono']:.0%}** de su OSA disponible).
     """)
+
+panel_perfil(perfil)
@@ -0,0 +1,54 @@
+"""Cierre mensual sin interfaz: distribución VITHAS-OSA para muchos centros y periodos.
+
+Uso:
+    python cierre_mensual.py facturacion/ informes/ [--procesos 8] [--esquema Cuartiles]
+
+Cada fichero de facturación (CSV, Excel o Parquet; un centro y un periodo)
+genera informes/<nombre>.xlsx con las hojas Totales_Globales, Por_Servicio,
+Por_Nivel y Detalle_Medicos, igual que la descarga de la página. Si dos
+ficheros comparten nombre (a.csv y a.xlsx) se añade la extensión: a_csv.xlsx.
+Un fichero que no se puede leer se anota como error y el lote continúa.
+"""
+import argparse
+import sys
+
+from motor import ErrorConfiguracion, procesar_directorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distribución VITHAS-OSA por lotes (cierre mensual)")
+    parser.add_argument("entrada", help="Directorio con los ficheros de facturación (o un fichero)")
+    parser.add_argument("salida", help="Directorio donde se escriben los Excel")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument("--config", default=None, help="Fichero de configuración (por defecto, config/distribucion.json)")
+    parser.add_argument("--esquema", default=None, help="Esquema de tramos por percentiles (por defecto, regla del promedio)")
+    parser.add_argument("--plantilla", action="store_true",
+                        help="Incluir todos los médicos de la configuración aunque no facturen")
+    parser.add_argument("--centimos", action="store_true",
+                        help="Calcular en céntimos enteros (los repartos cuadran al céntimo)")
+    args = parser.parse_args(argv)
+
+    def al_terminar(informe):
+        if informe["error"]:
+            print(f"❌ {informe['fichero']}: {informe['error']}", file=sys.stderr)
+        else:
+            print(f"✅ {informe['fichero']} -> {informe['destino']} "
+                  f"({informe['medicos']} médicos, {informe['segundos']:.2f} s)")
+
+    try:
+        _, resumen = procesar_directorio(args.entrada, args.salida, args.procesos, args.config, args.esquema,
+                                         args.plantilla, al_terminar=al_terminar, centimos=args.centimos)
+    except (ErrorConfiguracion, ValueError, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    print(
+        f"\n{resumen['ficheros']} ficheros ({resumen['errores']} con error), {resumen['medicos']:,} médicos, "
+        f"{resumen['filas']:,} líneas en {resumen['segundos']:.2f} s con {resumen['procesos']} procesos\n"
+        f"Ritmo: {resumen['ficheros_por_segundo']:.2f} ficheros/s, {resumen['medicos_por_segundo']:,.0f} médicos/s"
+    )
+    return 1 if resumen["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+from importlib import import_module
+
+# -------------------- Importación perezosa --------------------
+# `from motor import x` solo carga el submódulo que define `x` (PEP 562): las
+# páginas no pagan al arrancar el coste de simulación, importación, exportación
+# o lotes si no los usan en esa ejecución.
+
+_EXPORTS = {
+    "motor.distribucion": [
+        "calcular_distribucion", "calcular_resultados", "matriz_facturacion", "resumen_distribucion",
+        "tablas_resultados", "vectores_reparto",
+    ],
+    "motor.reglas": ["SumaExacta", "codigos_nivel", "compilar_reglas", "evaluar_reglas", "pct_nivel", "promedios_por_nivel"],
+    "motor.cache": ["CacheResultados", "cache_sesion", "huella"],
+    "motor.exportar": ["columnas_detalle", "escribir_excel", "excel_bytes", "hojas_resultados"],
+    "motor.importar": [
+        "ErrorImportacion", "agregar_facturacion", "agregar_facturacion_por_periodo", "combinar_con_plantilla",
+        "importar_facturacion", "leer_bloques",
+    ],
+    "motor.periodos": ["HistorialPeriodos", "historial_sesion", "periodo_actual", "periodo_valido"],
+    "motor.incremental": ["DistribucionIncremental", "resultados_incrementales"],
+    "motor.config": ["ErrorConfiguracion", "cargar_config", "compilar_config", "configuracion", "plantilla_facturacion"],
+    "motor.tramos": ["compilar_tramos", "evaluar_tramos", "umbrales_por_nivel"],
+    "motor.simulacion": ["DISTRIBUCIONES", "bandas_percentiles", "simular_pool_osa"],
+    "motor.sensibilidad": ["barrer_repartos"],
+    "motor.lote": ["ficheros_facturacion", "procesar_directorio", "procesar_fichero"],
+    "motor.paginacion": ["pagina_tabla"],
+    "motor.medicos": ["IndiceMedicos"],
+    "motor.sintetico": ["plantilla_sintetica"],
+    "motor.perfil": ["PerfilEjecuciones", "panel_perfil", "perfil_sesion"],
+    "motor.centimos": ["a_centimos", "a_euros", "exacto_en_puntos_basicos", "matriz_centimos", "puntos_basicos", "redondear", "repartir"],
+    "motor.informes": ["datos_informe", "generar_informes", "informe_html", "pdf_disponible"],
+    "motor.sesion": ["AlmacenSesion", "almacen_sesion"],
+    "motor.comparacion": ["COLUMNAS_IMPORTES", "comparacion_largo"],
+    "motor.graficos": [
+        "BINS_HISTOGRAMA", "MAX_FIGURAS", "MEDICOS_POR_PAGINA", "TOP_MEDICOS", "UMBRAL_MEDICOS_GRAFICO",
+        "figura_cacheada", "histograma", "resumen_cajas", "top_con_otros",
+    ],
+    "motor.presentacion": ["UMBRAL_FILAS_STYLER", "mostrar_tabla", "tabla_columnas", "tabla_styler"],
+}
+_MODULO_DE = {nombre: modulo for modulo, nombres in _EXPORTS.items() for nombre in nombres}
+
+__all__ = sorted(_MODULO_DE)
+
+
+def __getattr__(nombre):
+    modulo = _MODULO_DE.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module 'motor' has no attribute {nombre!r}")
+    valor = getattr(import_module(modulo), nombre)
+    globals()[nombre] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,96 @@
+import ast
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# -------------------- Tiempo de arranque --------------------
+# Mide en un intérprete nuevo (arranque en frío) lo que cuestan las
+# importaciones de la cabecera de cada página, con el desglose por módulo de
+# `python -X importtime`. Sirve para vigilar que nadie vuelva a subir
+# dependencias pesadas al principio de una página.
+
+RAIZ = Path(__file__).resolve().parent.parent
+PRESUPUESTO_MS = 1500.0
+MARCA = "-- importaciones de la página --"
+
+
+def presupuesto_ms():
+    # Configurable por entorno, igual que OSA_CONFIG
+    return float(os.environ.get("OSA_PRESUPUESTO_ARRANQUE_MS", PRESUPUESTO_MS))
+
+
+def entradas_app():
+    # Punto de entrada y páginas de la app
+    return [RAIZ / "app.py"] + sorted((RAIZ / "pages").glob("*.py"))
+
+
+def importaciones_iniciales(ruta):
+    # Imports de la cabecera del script: los que se pagan antes de pintar nada
+    # (los que una página hace más abajo, al llegar a un gráfico, no cuentan)
+    codigo = Path(ruta).read_text(encoding="utf-8")
+    sentencias = []
+    for nodo in ast.parse(codigo).body:
+        if isinstance(nodo, (ast.Import, ast.ImportFrom)):
+            sentencias.append(ast.get_source_segment(codigo, nodo))
+        elif not (isinstance(nodo, ast.Expr) and isinstance(nodo.value, ast.Constant)):
+            break
+    return sentencias
+
+
+def _leer_importtime(salida):
+    # Líneas "import time: propio | acumulado | módulo" (microsegundos)
+    modulos = []
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.append({
+            "modulo": nombre.strip(),
+            "nivel": (len(nombre) - len(nombre.lstrip()) - 1) // 2,
+            "propio_ms": int(propio) / 1000,
+            "acumulado_ms": int(acumulado) / 1000,
+        })
+    return modulos
+
+
+def medir_entrada(ruta, repeticiones=3):
+    """Importa en frío las dependencias de `ruta` `repeticiones` veces.
+
+    Devuelve el tiempo total (ms) de la ejecución mediana y el coste
+    acumulado de cada módulo que la cabecera importa directamente.
+    """
+    sentencias = importaciones_iniciales(ruta)
+    codigo = "\n".join([
+        "import sys, time",
+        f"sys.path.insert(0, {str(RAIZ)!r})",
+        f"sys.stderr.write({MARCA!r} + '\\n'); sys.stderr.flush()",
+        "_inicio = time.perf_counter()",
+        *sentencias,
+        "print((time.perf_counter() - _inicio) * 1000)",
+    ])
+    ejecuciones = []
+    for _ in range(repeticiones):
+        proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=RAIZ,
+                                 capture_output=True, text=True, check=True)
+        ejecuciones.append((float(proceso.stdout.strip().splitlines()[-1]), proceso.stderr))
+
+    total, stderr = sorted(ejecuciones)[len(ejecuciones) // 2]
+    # Solo los módulos cargados por la página (no los del arranque del intérprete)
+    modulos = [m for m in _leer_importtime(stderr.split(MARCA)[-1]) if m["nivel"] == 0]
+    return {
+        "entrada": os.path.relpath(ruta, RAIZ),
+        "total_ms": total,
+        "modulos": sorted(modulos, key=lambda m: m["acumulado_ms"], reverse=True),
+    }
+
+
+def informe_arranque(entradas=None, repeticiones=3, presupuesto=None):
+    # Un informe por entrada, con si cumple o no el presupuesto
+    presupuesto = presupuesto_ms() if presupuesto is None else presupuesto
+    informes = []
+    for ruta in entradas or entradas_app():
+        informe = medir_entrada(ruta, repeticiones)
+        informe["dentro_presupuesto"] = informe["total_ms"] <= presupuesto
+        informes.append(informe)
+    return informes, presupuesto
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# -------------------- Caché de resultados por huella de contenido --------------------
+# Streamlit reejecuta el script completo en cada interacción. La huella del
+# contenido de los datos (y de las definiciones de servicios/niveles) permite
+# reutilizar los resultados ya calculados cuando nada ha cambiado.
+
+
+def huella(df, *definiciones):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    for definicion in definiciones:
+        h.update(json.dumps(definicion, sort_keys=True, ensure_ascii=False, default=str).encode())
+    return h.hexdigest()
+
+
+class CacheResultados:
+    """Caché LRU de tamaño acotado con contadores de aciertos y fallos."""
+
+    def __init__(self, max_entradas=8):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, clave):
+        return clave in self._entradas
+
+    def obtener(self, clave, calcular):
+        # Devuelve el resultado guardado o lo calcula y lo guarda. El cálculo
+        # queda fuera del lock (p. ej. descargas generadas en otro hilo).
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave]
+            self.fallos += 1
+        resultado = calcular()
+        with self._lock:
+            self._entradas[clave] = resultado
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return resultado
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+        }
+
+
+def cache_sesion(session_state, nombre, max_entradas=8):
+    # Una caché por sesión de Streamlit, guardada en session_state
+    if nombre not in session_state:
+        session_state[nombre] = CacheResultados(max_entradas)
+    return session_state[nombre]
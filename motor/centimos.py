@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# -------------------- Importes exactos en céntimos --------------------
+# Con importes al céntimo la facturación se calcula como matriz int64 de
+# céntimos. Política de redondeo: cada importe se lleva al céntimo más cercano
+# al entrar (mitades alejándose de cero) y en cada reparto solo se redondea
+# una de las partes; la otra es la resta. Así VITHAS + OSA == bruto y
+# abonado + queda == OSA al céntimo, celda a celda y en los totales.
+# Los repartos se hacen en enteros: los porcentajes pasan una vez a puntos
+# básicos (0,70 → 7000) y 45 ct × 70 % da 32 ct, no el 31 de 31,499999... en
+# coma flotante. Un porcentaje con más de 4 decimales es un error.
+
+PUNTOS_BASICOS = 10_000
+TOLERANCIA_PUNTOS = 1e-6   # error de representación admitido, en puntos básicos
+
+
+def redondear(valores):
+    # Al entero más cercano, mitades alejándose de cero
+    valores = np.asarray(valores, dtype=float)
+    return (np.sign(valores) * np.floor(np.abs(valores) + 0.5)).astype(np.int64)
+
+
+def a_centimos(euros):
+    # El producto × 100 arrastra el error de representación (1,005 € → 100,4999...):
+    # se descarta por debajo de la millonésima de céntimo antes de redondear
+    return redondear(np.round(np.asarray(euros, dtype=float) * 100, 6))
+
+
+def a_euros(centimos):
+    return np.asarray(centimos, dtype=np.int64) / 100
+
+
+def exacto_en_puntos_basicos(pct):
+    # True donde el porcentaje cabe en puntos básicos (hasta 4 decimales)
+    puntos = np.asarray(pct, dtype=float) * PUNTOS_BASICOS
+    return np.abs(puntos - np.rint(puntos)) <= TOLERANCIA_PUNTOS
+
+
+def puntos_basicos(pct):
+    # Porcentaje como entero de puntos básicos (1 = 0,01 %); no redondea en silencio
+    pct = np.asarray(pct, dtype=float)
+    exactos = exacto_en_puntos_basicos(pct)
+    if not np.all(exactos):
+        raise ValueError(
+            f"Porcentajes con más de 4 decimales (el cálculo al céntimo usa puntos básicos): "
+            f"{sorted(set(np.atleast_1d(pct)[~np.atleast_1d(exactos)].tolist()))}"
+        )
+    return np.rint(pct * PUNTOS_BASICOS).astype(np.int64)
+
+
+def repartir(centimos, pct):
+    """Divide `centimos` en (parte, resto) con parte = redondear(centimos × pct).
+
+    `pct` se difunde sobre `centimos` (p. ej. un vector por servicio sobre la
+    matriz médico × servicio) y se lleva a puntos básicos; el producto y el
+    redondeo (mitades alejándose de cero) son enteros. parte + resto ==
+    centimos siempre.
+    """
+    centimos = np.asarray(centimos, dtype=np.int64)
+    producto = centimos * puntos_basicos(pct)
+    parte = np.sign(producto) * ((np.abs(producto) * 2 + PUNTOS_BASICOS) // (2 * PUNTOS_BASICOS))
+    return parte, centimos - parte
+
+
+def matriz_centimos(df, nombres_servicios):
+    # Columnas de servicio numéricas en céntimos; lo no convertible cuenta como 0
+    if not nombres_servicios:
+        return np.zeros((len(df), 0), dtype=np.int64)
+    return np.column_stack([
+        a_centimos(pd.to_numeric(df[s], errors="coerce").fillna(0.0).to_numpy(dtype=float))
+        for s in nombres_servicios
+    ])
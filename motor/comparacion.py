@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from motor.distribucion import matriz_facturacion, vectores_reparto
+
+# -------------------- Comparación entre médicos (formato largo) --------------------
+# Una fila por médico × servicio con el reparto de cada importe. Se construye
+# de una vez a partir de la matriz de facturación (n médicos × s servicios),
+# así comparar 500 médicos cuesta lo mismo que comparar 5.
+
+COLUMNAS_IMPORTES = ["Facturación", "VITHAS", "OSA", "Abonado al Médico"]
+
+
+def comparacion_largo(df_calc, servicios, totales=False):
+    """Tabla Médico, Servicio, Facturación, VITHAS, OSA, Abonado al Médico.
+
+    `df_calc` son las filas de resultados de los médicos a comparar (con
+    Pct_Abono). Con `totales` cada médico termina con una fila TOTAL.
+    """
+    nombres, pct_vithas, pct_osa = vectores_reparto(servicios)
+    facturacion = matriz_facturacion(df_calc, nombres)
+    osa = facturacion * pct_osa
+    importes = [facturacion, facturacion * pct_vithas, osa,
+                osa * df_calc["Pct_Abono"].to_numpy(dtype=float)[:, None]]
+    etiquetas = nombres
+    if totales:
+        # Suma por médico de sus servicios: una columna más en cada matriz
+        importes = [np.column_stack([m, m.sum(axis=1)]) for m in importes]
+        etiquetas = nombres + ["TOTAL"]
+
+    n, columnas = importes[0].shape
+    return pd.DataFrame({
+        "Médico": np.repeat(df_calc["Médico"].to_numpy(dtype=object), columnas),
+        "Servicio": np.tile(np.array(etiquetas, dtype=object), n),
+        **{nombre: m.ravel() for nombre, m in zip(COLUMNAS_IMPORTES, importes)},
+    })
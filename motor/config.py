@@ -0,0 +1,153 @@
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from motor.centimos import exacto_en_puntos_basicos
+from motor.reglas import compilar_reglas
+from motor.tramos import compilar_tramos
+
+# -------------------- Configuración compartida --------------------
+# Servicios (reparto VITHAS/OSA), niveles con sus médicos y reglas de abono
+# viven en un único fichero versionado. Se carga y valida una sola vez por
+# proceso y se compila en tablas de arrays que usan todas las páginas.
+
+RUTA_CONFIG = Path(__file__).resolve().parent.parent / "config" / "distribucion.json"
+VERSIONES_SOPORTADAS = (1,)
+TOLERANCIA_REPARTO = 1e-9
+
+
+class ErrorConfiguracion(ValueError):
+    pass
+
+
+def _validar(datos):
+    errores = []
+    if datos.get("version") not in VERSIONES_SOPORTADAS:
+        errores.append(f"versión no soportada: {datos.get('version')!r}")
+
+    servicios = datos.get("servicios") or {}
+    if not servicios:
+        errores.append("no hay servicios definidos")
+    alias_vistos = {}
+    for nombre, reparto in servicios.items():
+        vithas, osa = reparto.get("VITHAS"), reparto.get("OSA")
+        if not all(isinstance(v, (int, float)) and 0 <= v <= 1 for v in (vithas, osa)):
+            errores.append(f"servicio {nombre!r}: VITHAS y OSA deben estar entre 0 y 1")
+        elif not exacto_en_puntos_basicos([vithas, osa]).all():
+            errores.append(f"servicio {nombre!r}: VITHAS y OSA con 4 decimales como máximo")
+        elif abs(vithas + osa - 1) > TOLERANCIA_REPARTO:
+            errores.append(f"servicio {nombre!r}: VITHAS + OSA debe sumar 1 (suma {vithas + osa})")
+        for alias in reparto.get("alias", []):
+            if alias in servicios or alias in alias_vistos:
+                errores.append(f"alias de servicio repetido: {alias!r}")
+            alias_vistos[alias] = nombre
+
+    niveles = datos.get("niveles") or {}
+    if not niveles:
+        errores.append("no hay niveles definidos")
+    vistos = {}
+    for nivel, medicos in niveles.items():
+        for medico in medicos:
+            if medico in vistos:
+                errores.append(f"médico {medico!r} en dos niveles ({vistos[medico]} y {nivel})")
+            vistos[medico] = nivel
+
+    reglas = datos.get("reglas_abono") or {}
+    for nivel in niveles:
+        if nivel not in reglas:
+            errores.append(f"nivel {nivel!r} sin regla de abono")
+    for nivel, regla in reglas.items():
+        if nivel not in niveles:
+            errores.append(f"regla de abono para un nivel inexistente: {nivel!r}")
+        bajo, alto = regla.get("debajo_promedio"), regla.get("encima_promedio")
+        if not all(isinstance(v, (int, float)) and 0 <= v <= 1 for v in (bajo, alto)):
+            errores.append(f"regla {nivel!r}: porcentajes entre 0 y 1")
+        elif not exacto_en_puntos_basicos([bajo, alto]).all():
+            errores.append(f"regla {nivel!r}: porcentajes con 4 decimales como máximo")
+
+    for esquema, definicion in (datos.get("esquemas_tramos") or {}).items():
+        percentiles = definicion.get("percentiles") or []
+        if not all(isinstance(p, (int, float)) and 0 < p < 100 for p in percentiles) \
+                or any(a >= b for a, b in zip(percentiles, percentiles[1:])):
+            errores.append(f"esquema {esquema!r}: percentiles crecientes entre 0 y 100")
+        pagos = definicion.get("pagos") or {}
+        for nivel in niveles:
+            tramo_pagos = pagos.get(nivel)
+            if tramo_pagos is None or len(tramo_pagos) != len(percentiles) + 1:
+                errores.append(f"esquema {esquema!r}: el nivel {nivel!r} necesita {len(percentiles) + 1} pagos")
+            elif not all(isinstance(v, (int, float)) and 0 <= v <= 1 for v in tramo_pagos):
+                errores.append(f"esquema {esquema!r}: pagos de {nivel!r} entre 0 y 1")
+            elif not exacto_en_puntos_basicos(tramo_pagos).all():
+                errores.append(f"esquema {esquema!r}: pagos de {nivel!r} con 4 decimales como máximo")
+
+    if errores:
+        raise ErrorConfiguracion("Configuración no válida: " + "; ".join(errores))
+
+
+def compilar_config(datos):
+    """Valida `datos` y los compila en tablas listas para el motor."""
+    _validar(datos)
+    servicios = {
+        nombre: {"VITHAS": float(r["VITHAS"]), "OSA": float(r["OSA"])}
+        for nombre, r in datos["servicios"].items()
+    }
+    niveles = {nivel: list(medicos) for nivel, medicos in datos["niveles"].items()}
+    reglas = compilar_reglas({
+        nivel: (float(r["debajo_promedio"]), float(r["encima_promedio"]))
+        for nivel, r in datos["reglas_abono"].items()
+    })
+
+    # Índice médico -> código de nivel (posición en reglas["niveles"])
+    medicos = np.array([m for lista in niveles.values() for m in lista], dtype=object)
+    codigo_de = {nivel: i for i, nivel in enumerate(reglas["niveles"])}
+    codigos = np.array([codigo_de[n] for n, lista in niveles.items() for _ in lista], dtype=np.intp)
+
+    nombres = list(servicios)
+    return {
+        "version": datos["version"],
+        "servicios": servicios,
+        "nombres_servicios": nombres,
+        "vector_vithas": np.array([servicios[s]["VITHAS"] for s in nombres]),
+        "vector_osa": np.array([servicios[s]["OSA"] for s in nombres]),
+        "alias_servicios": {a: n for n, r in datos["servicios"].items() for a in r.get("alias", [])},
+        "niveles": niveles,
+        "reglas": reglas,
+        "medicos": medicos,
+        "codigos_nivel": codigos,
+        "nivel_de": {m: n for n, lista in niveles.items() for m in lista},
+        "esquemas_tramos": {
+            esquema: compilar_tramos(d["percentiles"], d["pagos"], reglas["niveles"])
+            for esquema, d in (datos.get("esquemas_tramos") or {}).items()
+        },
+    }
+
+
+def cargar_config(ruta=None):
+    ruta = Path(ruta or os.environ.get("OSA_CONFIG", RUTA_CONFIG))
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ErrorConfiguracion(f"No se pudo leer la configuración {ruta}: {e}")
+    return compilar_config(datos)
+
+
+@lru_cache(maxsize=None)
+def configuracion():
+    # Cargada una vez por proceso del servidor
+    return cargar_config()
+
+
+def plantilla_facturacion(config):
+    # DataFrame base para st.data_editor: todos los médicos con importes a 0
+    df = pd.DataFrame({
+        "Médico": config["medicos"],
+        "Nivel": np.array(config["reglas"]["niveles"], dtype=object)[config["codigos_nivel"]],
+    })
+    for s in config["nombres_servicios"]:
+        df[s] = 0.0
+    return df
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+from motor.centimos import a_euros, matriz_centimos, repartir
+from motor.config import configuracion
+from motor.medicos import IndiceMedicos
+from motor.reglas import codigos_nivel, promedios_por_nivel, evaluar_reglas
+from motor.tramos import evaluar_tramos, umbrales_por_nivel
+
+# -------------------- Motor de distribución VITHAS-OSA --------------------
+# La tabla `servicios` se representa como dos vectores (VITHAS y OSA) y la
+# facturación como una matriz médico × servicio. Todos los cálculos por médico
+# se hacen con operaciones sobre arrays, sin recorrer filas en Python.
+
+
+def vectores_reparto(servicios):
+    nombres = list(servicios.keys())
+    vithas = np.array([servicios[s]["VITHAS"] for s in nombres], dtype=float)
+    osa = np.array([servicios[s]["OSA"] for s in nombres], dtype=float)
+    return nombres, vithas, osa
+
+
+def matriz_facturacion(df, nombres_servicios):
+    # Columnas de servicio numéricas; lo no convertible cuenta como 0
+    return np.column_stack([
+        pd.to_numeric(df[s], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        for s in nombres_servicios
+    ]) if nombres_servicios else np.zeros((len(df), 0))
+
+
+def _producto_reparto(matriz, vector):
+    # Acumula servicio a servicio (mismo orden de suma que el cálculo fila a fila)
+    acumulado = np.zeros(matriz.shape[0])
+    for j in range(matriz.shape[1]):
+        acumulado += matriz[:, j] * vector[j]
+    return acumulado
+
+
+def _pct_abono(df, reglas, tramos, total_bruto_med, solo_positivos):
+    # Promedio bruto por nivel y porcentaje de abono (regla del promedio o tramos)
+    codigos = codigos_nivel(reglas, df["Nivel"])
+    promedios, _ = promedios_por_nivel(reglas, codigos, total_bruto_med, solo_positivos)
+    if tramos is None:
+        return promedios, None, evaluar_reglas(reglas, codigos, total_bruto_med, promedios, solo_positivos)
+    codigos_tramos = codigos_nivel(tramos, df["Nivel"])
+    umbrales = umbrales_por_nivel(tramos, codigos_tramos, total_bruto_med, solo_positivos)
+    tramo, pct = evaluar_tramos(tramos, codigos_tramos, total_bruto_med, umbrales, solo_positivos)
+    return promedios, tramo, pct
+
+
+def _columnas_calculadas(out, total_bruto_med, total_vithas_med, total_osa_med, tramo, pct, abonado, queda_osa):
+    out["Total_Bruto"] = total_bruto_med
+    out["Total_VITHAS"] = total_vithas_med
+    out["Total_OSA_Disponible"] = total_osa_med
+    if tramo is not None:
+        out["Tramo"] = tramo + 1
+    out["Pct_Abono"] = pct
+    out["Abonado_a_Medico"] = abonado
+    out["Queda_en_OSA_por_medico"] = queda_osa
+
+    # Diferencia porcentual entre lo que facturó bruto y lo que recibió
+    with np.errstate(divide="ignore", invalid="ignore"):
+        diferencia = abonado / total_bruto_med - 1
+    out["Diferencia_%"] = np.where(np.isfinite(diferencia), diferencia, 0.0)
+    return out
+
+
+def calcular_distribucion(df, servicios, solo_positivos=False, reglas=None, tramos=None, centimos=False):
+    """Calcula la distribución VITHAS-OSA y los abonos por médico.
+
+    Devuelve una copia de `df` con las columnas calculadas y un diccionario con
+    los totales globales, por servicio y los promedios por nivel.
+    Con `solo_positivos=True` los promedios por nivel solo consideran médicos
+    con facturación mayor que cero y quien no facturó recibe abono cero.
+    `reglas` es una tabla de `compilar_reglas` (por defecto, la de la configuración).
+    Con `tramos` (de `compilar_tramos`) el porcentaje sale del tramo de
+    percentiles de cada médico en lugar de la regla del promedio, y se añade
+    la columna Tramo.
+    Con `centimos=True` los importes se calculan en céntimos enteros
+    (ver motor.centimos) y los repartos cuadran al céntimo.
+    """
+    if reglas is None:
+        reglas = configuracion()["reglas"]
+    if centimos:
+        return _distribucion_centimos(df, servicios, solo_positivos, reglas, tramos)
+    nombres, pct_vithas, pct_osa = vectores_reparto(servicios)
+    matriz = matriz_facturacion(df, nombres)
+
+    out = df.copy()
+    for j, s in enumerate(nombres):
+        out[s] = matriz[:, j]
+
+    total_bruto_med = _producto_reparto(matriz, np.ones(len(nombres)))
+    total_osa_med = _producto_reparto(matriz, pct_osa)
+    total_vithas_med = _producto_reparto(matriz, pct_vithas)
+
+    promedios, tramo, pct = _pct_abono(out, reglas, tramos, total_bruto_med, solo_positivos)
+    abonado = total_osa_med * pct
+    queda_osa = total_osa_med - abonado
+    _columnas_calculadas(out, total_bruto_med, total_vithas_med, total_osa_med, tramo, pct, abonado, queda_osa)
+
+    resumen = resumen_distribucion(
+        nombres, matriz.sum(axis=0), pct_vithas, pct_osa, float(total_bruto_med.sum()),
+        dict(zip(reglas["niveles"], promedios.tolist())), float(abonado.sum())
+    )
+    return out, resumen
+
+
+def _distribucion_centimos(df, servicios, solo_positivos, reglas, tramos):
+    # Mismo cálculo sobre la matriz en céntimos: cada celda se reparte en
+    # OSA (redondeada) y VITHAS (el resto), y el OSA de cada médico en
+    # abonado (redondeado) y queda (el resto)
+    nombres, pct_vithas, pct_osa = vectores_reparto(servicios)
+    matriz = matriz_centimos(df, nombres)
+    osa_celdas, vithas_celdas = repartir(matriz, pct_osa)
+
+    total_bruto_med = matriz.sum(axis=1)
+    total_osa_med = osa_celdas.sum(axis=1)
+    total_vithas_med = vithas_celdas.sum(axis=1)
+
+    promedios, tramo, pct = _pct_abono(df, reglas, tramos, total_bruto_med.astype(float), solo_positivos)
+    abonado, queda_osa = repartir(total_osa_med, pct)
+
+    out = df.copy()
+    for j, s in enumerate(nombres):
+        out[s] = a_euros(matriz[:, j])
+    _columnas_calculadas(
+        out, a_euros(total_bruto_med), a_euros(total_vithas_med), a_euros(total_osa_med), tramo, pct,
+        a_euros(abonado), a_euros(queda_osa)
+    )
+
+    totales_osa = osa_celdas.sum(axis=0)
+    totales_vithas = vithas_celdas.sum(axis=0)
+    total_osa, total_abonado = int(totales_osa.sum()), int(abonado.sum())
+    resumen = {
+        "totales_por_servicio": dict(zip(nombres, a_euros(matriz.sum(axis=0)).tolist())),
+        "totales_vithas_por_servicio": dict(zip(nombres, a_euros(totales_vithas).tolist())),
+        "totales_osa_por_servicio": dict(zip(nombres, a_euros(totales_osa).tolist())),
+        "total_bruto": int(total_bruto_med.sum()) / 100,
+        "total_vithas": int(totales_vithas.sum()) / 100,
+        "total_osa": total_osa / 100,
+        "promedios_nivel": dict(zip(reglas["niveles"], (promedios / 100).tolist())),
+        "total_abonado_a_medicos": total_abonado / 100,
+        "osa_saldo_final": (total_osa - total_abonado) / 100,
+    }
+    return out, resumen
+
+
+def resumen_distribucion(nombres, totales_por_servicio, pct_vithas, pct_osa, total_bruto, promedios_nivel,
+                         total_abonado):
+    # Totales por servicio y globales
+    totales_vithas = totales_por_servicio * pct_vithas
+    totales_osa = totales_por_servicio * pct_osa
+    total_osa = float(totales_osa.sum())
+    return {
+        "totales_por_servicio": dict(zip(nombres, totales_por_servicio.tolist())),
+        "totales_vithas_por_servicio": dict(zip(nombres, totales_vithas.tolist())),
+        "totales_osa_por_servicio": dict(zip(nombres, totales_osa.tolist())),
+        "total_bruto": total_bruto,
+        "total_vithas": float(totales_vithas.sum()),
+        "total_osa": total_osa,
+        "promedios_nivel": promedios_nivel,
+        "total_abonado_a_medicos": total_abonado,
+        "osa_saldo_final": total_osa - total_abonado,
+    }
+
+
+def tablas_resultados(df_calc, resumen, servicios, indice=None):
+    # Tablas por servicio y por nivel a partir de una distribución ya calculada,
+    # más el índice de médicos para consultas por Médico y por Nivel
+    serv_df = pd.DataFrame({
+        'Servicio': list(servicios.keys()),
+        'Facturación_Total': list(resumen['totales_por_servicio'].values()),
+        'VITHAS': list(resumen['totales_vithas_por_servicio'].values()),
+        'OSA': list(resumen['totales_osa_por_servicio'].values()),
+        '% VITHAS': [servicios[s]['VITHAS'] * 100 for s in servicios.keys()],
+        '% OSA': [servicios[s]['OSA'] * 100 for s in servicios.keys()]
+    })
+
+    agregado_nivel = df_calc.groupby('Nivel')['Total_Bruto'].agg(['sum', 'size'])
+    nivel_df = pd.DataFrame({
+        'Nivel': agregado_nivel.index,
+        'Total_Bruto': agregado_nivel['sum'].to_numpy(),
+        'Número de Médicos': agregado_nivel['size'].to_numpy(),
+        'Promedio por Médico': (agregado_nivel['sum'] / agregado_nivel['size']).to_numpy()
+    })
+
+    indice = indice.sobre(df_calc) if indice is not None else IndiceMedicos(df_calc)
+    return {'df_edit': df_calc, 'resumen': resumen, 'serv_df': serv_df, 'nivel_df': nivel_df, 'indice': indice}
+
+
+def calcular_resultados(df, servicios, solo_positivos=False, reglas=None, tramos=None, centimos=False):
+    # Distribución por médico más las tablas por servicio y por nivel
+    df_calc, resumen = calcular_distribucion(df, servicios, solo_positivos, reglas, tramos, centimos)
+    return tablas_resultados(df_calc, resumen, servicios)
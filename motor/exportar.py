@@ -0,0 +1,65 @@
+from io import BytesIO
+
+import pandas as pd
+
+# -------------------- Exportación a Excel --------------------
+# El libro se escribe fila a fila con xlsxwriter en modo `constant_memory`:
+# cada fila se vuelca a disco al pasar a la siguiente, así que hojas con
+# decenas de miles de médicos no disparan la memoria.
+
+FILAS_POR_BLOQUE = 5000
+
+
+def columnas_detalle(df_calc, servicios):
+    # Columnas de la tabla de detalle por médico (con Tramo si hay esquema por percentiles)
+    columnas = ['Médico', 'Nivel'] + list(servicios.keys()) + ['Total_Bruto', 'Total_OSA_Disponible', 'Pct_Abono', 'Abonado_a_Medico', 'Queda_en_OSA_por_medico', 'Diferencia_%']
+    if 'Tramo' in df_calc.columns:
+        columnas.insert(columnas.index('Pct_Abono'), 'Tramo')
+    return columnas
+
+
+def hojas_resultados(resumen, serv_df, nivel_df, detalle_medicos):
+    # Las cuatro hojas del informe completo, en orden
+    hoja_totales_globales = pd.DataFrame({
+        'Concepto': ['Total Bruto', 'Total VITHAS', 'Total OSA (pool inicial)', 'Total abonado a médicos', 'Saldo OSA final'],
+        'Valor (€)': [resumen['total_bruto'], resumen['total_vithas'], resumen['total_osa'],
+                      resumen['total_abonado_a_medicos'], resumen['osa_saldo_final']]
+    })
+    return [
+        ('Totales_Globales', hoja_totales_globales),
+        ('Por_Servicio', serv_df),
+        ('Por_Nivel', nivel_df),
+        ('Detalle_Medicos', detalle_medicos),
+    ]
+
+
+def _escribir_hoja(workbook, nombre, df, formato_cabecera):
+    worksheet = workbook.add_worksheet(nombre)
+    worksheet.write_row(0, 0, [str(c) for c in df.columns], formato_cabecera)
+    fila = 1
+    # Por bloques: solo un bloque de filas convertido a objetos Python a la vez
+    for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+        bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+        for valores in bloque.itertuples(index=False, name=None):
+            worksheet.write_row(fila, 0, valores)
+            fila += 1
+
+
+def escribir_excel(destino, hojas):
+    """Escribe `hojas` (lista de (nombre, DataFrame)) en `destino`.
+
+    `destino` puede ser una ruta o un objeto tipo fichero.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(destino, {'constant_memory': True, 'nan_inf_to_errors': True})
+    formato_cabecera = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    for nombre, df in hojas:
+        _escribir_hoja(workbook, nombre, df, formato_cabecera)
+    workbook.close()
+
+
+def excel_bytes(hojas):
+    output = BytesIO()
+    escribir_excel(output, hojas)
+    return output.getvalue()
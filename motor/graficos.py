@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from motor.cache import huella
+
+# -------------------- Gráficos con muchos médicos --------------------
+# Por encima de un umbral de médicos los gráficos dejan de dibujar una barra
+# (o una faceta) por médico: se agregan aquí, en el servidor, en los N mayores
+# más "Otros", en distribuciones (cuartiles e histograma ya calculados) o se
+# paginan. Así el tamaño de la figura que viaja al navegador en cada
+# reejecución tiene un máximo fijo, haya 10 médicos o 10.000.
+
+UMBRAL_MEDICOS_GRAFICO = 30   # hasta aquí, una barra por médico
+TOP_MEDICOS = 15              # médicos que se muestran con nombre en el modo agregado
+MEDICOS_POR_PAGINA = 6        # facetas por página en las comparaciones por médico
+BINS_HISTOGRAMA = 30
+
+
+def top_con_otros(df, columnas, orden="Total_Bruto", n=TOP_MEDICOS):
+    """Los `n` médicos con mayor `orden` y una fila "Otros" con la media del resto."""
+    if len(df) <= n:
+        return df[["Médico"] + columnas].reset_index(drop=True)
+    posiciones = np.argsort(-df[orden].to_numpy(dtype=float), kind="stable")
+    top, resto = posiciones[:n], posiciones[n:]
+    otros = pd.DataFrame({
+        "Médico": [f"Otros ({len(resto)} médicos, media)"],
+        **{c: [float(df[c].iloc[resto].mean())] for c in columnas},
+    })
+    return pd.concat([df[["Médico"] + columnas].iloc[top], otros], ignore_index=True)
+
+
+def resumen_cajas(df, columnas):
+    """Cuartiles y bigotes (1,5 × rango intercuartílico) de cada columna.
+
+    Devuelve una fila por columna con q1, mediana, q3, minimo y maximo para
+    dibujar diagramas de caja sin enviar cada valor al navegador.
+    """
+    valores = df[columnas].to_numpy(dtype=float)
+    if len(valores) == 0:
+        return pd.DataFrame({"Concepto": columnas, "q1": 0.0, "mediana": 0.0, "q3": 0.0, "minimo": 0.0, "maximo": 0.0})
+    q1, mediana, q3 = np.percentile(valores, [25, 50, 75], axis=0)
+    rango = q3 - q1
+    # Bigotes hasta el valor más extremo dentro de 1,5 × RIC (como Plotly)
+    dentro_bajo = np.where(valores >= q1 - 1.5 * rango, valores, np.inf).min(axis=0)
+    dentro_alto = np.where(valores <= q3 + 1.5 * rango, valores, -np.inf).max(axis=0)
+    return pd.DataFrame({
+        "Concepto": columnas, "q1": q1, "mediana": mediana, "q3": q3, "minimo": dentro_bajo, "maximo": dentro_alto,
+    })
+
+
+def histograma(valores, bins=BINS_HISTOGRAMA):
+    # Conteo por intervalo calculado aquí: al gráfico solo llegan `bins` barras
+    conteos, bordes = np.histogram(np.asarray(valores, dtype=float), bins=bins)
+    return pd.DataFrame({
+        "Desde": bordes[:-1], "Hasta": bordes[1:], "Centro": (bordes[:-1] + bordes[1:]) / 2, "Médicos": conteos,
+    })
+
+
+# -------------------- Caché de figuras --------------------
+# Construir una figura de Plotly (validación de trazas, plantillas de px) cuesta
+# más que pintarla. Las figuras se guardan en una caché LRU de la sesión por
+# huella de los datos de entrada y de los parámetros de diseño: si nada cambió
+# se reutiliza el mismo objeto. Lo que sí se repite en cada reejecución es la
+# serialización: st.plotly_chart convierte la figura a JSON (plotly.io.to_json)
+# cada vez y no admite una especificación ya serializada. Con la figura en
+# caché eso cuesta unos 2 ms frente a unos 50 ms de construirla con px.
+
+MAX_FIGURAS = 24
+
+
+def figura_cacheada(cache, nombre, df, construir, *parametros):
+    """Figura `nombre` de `df` guardada en `cache` (CacheResultados).
+
+    `construir(df)` solo se llama si no hay ya una figura con la misma huella
+    de `df` y de `parametros` (títulos, nivel o médico seleccionado, modo...).
+    """
+    return cache.obtener(huella(df, nombre, *parametros), lambda: construir(df))
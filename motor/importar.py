@@ -0,0 +1,283 @@
+import os
+import unicodedata
+import zipfile
+
+import pandas as pd
+
+# -------------------- Importación masiva de facturación --------------------
+# Los ficheros del hospital traen una línea por acto: médico, servicio, fecha e
+# importe. Se leen por bloques y cada bloque se agrega en el momento a la
+# matriz médico × servicio, así la memoria depende del número de médicos y no
+# del tamaño del fichero.
+
+FILAS_POR_BLOQUE = 200_000
+
+# Nombres de columna aceptados (normalizados: minúsculas y sin acentos)
+ALIAS_COLUMNAS = {
+    "Médico": ["medico", "doctor", "facultativo"],
+    "Servicio": ["servicio", "prestacion", "concepto"],
+    "Fecha": ["fecha", "fecha_acto", "fecha_servicio"],
+    "Importe": ["importe", "monto", "facturacion", "amount"],
+    "Nivel": ["nivel"],
+}
+COLUMNAS_OBLIGATORIAS = ["Médico", "Servicio", "Importe"]
+
+
+class ErrorImportacion(ValueError):
+    pass
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return texto.strip().lower().replace(" ", "_")
+
+
+def _mapa_columnas(columnas):
+    normalizadas = {_normalizar(c): c for c in columnas}
+    mapa = {}
+    for destino, alias in ALIAS_COLUMNAS.items():
+        for a in alias:
+            if a in normalizadas:
+                mapa[normalizadas[a]] = destino
+                break
+    faltan = [c for c in COLUMNAS_OBLIGATORIAS if c not in mapa.values()]
+    if faltan:
+        raise ErrorImportacion(f"Faltan columnas en el fichero: {', '.join(faltan)}")
+    return mapa
+
+
+def _formato(nombre):
+    extension = os.path.splitext(str(nombre))[1].lower()
+    if extension in (".csv", ".txt"):
+        return "csv"
+    if extension in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    raise ErrorImportacion(f"Formato no soportado: {extension or nombre}")
+
+
+def _separador_csv(fichero):
+    # Los exports en español suelen venir con ';' y coma decimal
+    if hasattr(fichero, "read"):
+        posicion = fichero.tell()
+        cabecera = fichero.readline()
+        fichero.seek(posicion)
+    else:
+        with open(fichero, "rb") as f:
+            cabecera = f.readline()
+    if isinstance(cabecera, bytes):
+        cabecera = cabecera.decode("utf-8", errors="ignore")
+    return ";" if cabecera.count(";") > cabecera.count(",") else ","
+
+
+def _bloques_csv(fichero, filas_por_bloque):
+    separador = _separador_csv(fichero)
+    # Con ';' los importes vienen como 1.000,25 (punto de miles y coma decimal)
+    formato_numeros = {"decimal": ",", "thousands": "."} if separador == ";" else {"decimal": "."}
+    for bloque in pd.read_csv(fichero, sep=separador, chunksize=filas_por_bloque, **formato_numeros):
+        # Si una celda no es numérica la columna queda como texto: _importes
+        # vuelve a leer cada importe con el mismo formato
+        bloque.attrs["decimal"] = formato_numeros["decimal"]
+        yield bloque
+
+
+def _bloques_xlsx(fichero, filas_por_bloque):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # Modo solo lectura: openpyxl recorre la hoja sin cargarla entera
+    try:
+        workbook = load_workbook(fichero, read_only=True, data_only=True)
+    except InvalidFileException as e:
+        raise ErrorImportacion(f"No se pudo leer el fichero: {e}")
+    try:
+        filas = workbook.worksheets[0].iter_rows(values_only=True)
+        cabecera = next(filas, None)
+        if cabecera is None:
+            return
+        columnas = [str(c) for c in cabecera]
+        bloque = []
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) >= filas_por_bloque:
+                yield pd.DataFrame(bloque, columns=columnas)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas)
+    finally:
+        workbook.close()
+
+
+def _bloques_parquet(fichero, filas_por_bloque):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ErrorImportacion("Para importar Parquet hace falta instalar pyarrow")
+
+    for lote in pq.ParquetFile(fichero).iter_batches(batch_size=filas_por_bloque):
+        yield lote.to_pandas()
+
+
+def leer_bloques(fichero, nombre=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Itera el fichero de facturación en DataFrames de como mucho `filas_por_bloque` filas.
+
+    `fichero` es una ruta o un objeto tipo fichero; `nombre` indica el formato
+    por su extensión cuando `fichero` no es una ruta.
+    """
+    formato = _formato(nombre if nombre is not None else fichero)
+    lector = {"csv": _bloques_csv, "xlsx": _bloques_xlsx, "parquet": _bloques_parquet}[formato]
+    try:
+        yield from lector(fichero, filas_por_bloque)
+    except ErrorImportacion:
+        raise
+    except pd.errors.EmptyDataError:
+        raise ErrorImportacion("El fichero está vacío")
+    except UnicodeDecodeError:
+        raise ErrorImportacion("El fichero no está en UTF-8; expórtelo de nuevo con codificación UTF-8")
+    except (pd.errors.ParserError, zipfile.BadZipFile, ValueError, KeyError) as e:
+        # CSV mal formado, Excel dañado o Parquet ilegible (openpyxl y pyarrow
+        # lanzan subclases de ValueError/KeyError)
+        raise ErrorImportacion(f"No se pudo leer el fichero: {e}")
+
+
+def _periodo(fechas):
+    # Mes natural AAAA-MM de cada línea ("Sin fecha" si no se puede leer)
+    # ISO (y fechas ya tipadas de Excel/Parquet) primero; el resto, día/mes/año
+    leidas = pd.to_datetime(fechas, errors="coerce", format="ISO8601")
+    pendientes = leidas.isna() & fechas.notna()
+    if pendientes.any():
+        leidas[pendientes] = pd.to_datetime(fechas[pendientes], errors="coerce", dayfirst=True, format="mixed")
+    return leidas.dt.strftime("%Y-%m").fillna("Sin fecha")
+
+
+def _importes(columna, decimal="."):
+    # Importes numéricos; los que llegan como texto se leen con el formato del
+    # fichero (1.000,25 con coma decimal, 1,000.25 con punto). NaN si no se puede
+    importe = pd.to_numeric(columna, errors="coerce")
+    texto = importe.isna() & columna.notna()
+    if texto.any():
+        miles = "." if decimal == "," else ","
+        limpio = (columna[texto].astype(str).str.strip()
+                  .str.replace(miles, "", regex=False).str.replace(decimal, ".", regex=False))
+        importe[texto] = pd.to_numeric(limpio, errors="coerce")
+    return importe
+
+
+def _agregar_bloque(bloque, nombres_servicios, por_periodo, alias_servicios):
+    decimal = bloque.attrs.get("decimal", ".")
+    bloque = bloque.rename(columns=_mapa_columnas(bloque.columns))
+    # Un importe vacío o ilegible no cuenta como 0: la línea se ignora y se informa
+    importe = _importes(bloque["Importe"], decimal)
+    con_importe = importe.notna()
+    importe = importe.fillna(0.0)
+    servicio = bloque["Servicio"].astype(str).str.strip()
+    if alias_servicios:
+        servicio = servicio.replace(alias_servicios)
+    conocido = servicio.isin(nombres_servicios)
+
+    medico = bloque["Médico"].astype(str).str.strip()
+    con_medico = bloque["Médico"].notna() & (medico != "")
+    valida = conocido & con_importe & con_medico
+    claves = [medico[valida], servicio[valida]]
+    if por_periodo:
+        if "Fecha" not in bloque.columns:
+            raise ErrorImportacion("Falta la columna Fecha para separar por periodos")
+        claves.insert(0, _periodo(bloque["Fecha"])[valida])
+    parcial = importe[valida].groupby(claves).sum()
+
+    niveles = None
+    if "Nivel" in bloque.columns:
+        niveles = bloque["Nivel"][con_medico].astype(str).str.strip().groupby(medico[con_medico]).first()
+    ignoradas = {
+        "filas_sin_medico": int((~con_medico).sum()),
+        "filas_sin_importe": int((con_medico & ~con_importe).sum()),
+        "filas_servicio_desconocido": int((con_medico & con_importe & ~conocido).sum()),
+    }
+    return parcial, niveles, ignoradas, float(importe[~valida].sum())
+
+
+def _acumular(bloques, nombres, por_periodo, alias_servicios):
+    acumulado = None
+    nivel_fichero = {}
+    informe = {"filas": 0, "filas_ignoradas": 0, "filas_sin_medico": 0, "filas_sin_importe": 0,
+               "filas_servicio_desconocido": 0, "importe_ignorado": 0.0}
+
+    for bloque in bloques:
+        informe["filas"] += len(bloque)
+        parcial, niveles_bloque, ignoradas, ignorado = _agregar_bloque(bloque, nombres, por_periodo, alias_servicios)
+        acumulado = parcial if acumulado is None else acumulado.add(parcial, fill_value=0.0)
+        for motivo, cuantas in ignoradas.items():
+            informe[motivo] += cuantas
+            informe["filas_ignoradas"] += cuantas
+        informe["importe_ignorado"] += ignorado
+        if niveles_bloque is not None:
+            for medico, nivel in niveles_bloque.items():
+                nivel_fichero.setdefault(medico, nivel)
+    return acumulado, nivel_fichero, informe
+
+
+def _tabla_editor(acumulado, nombres, nivel_de, nivel_fichero):
+    # Serie (Médico, Servicio) -> importe a formato del editor
+    if acumulado is None or acumulado.empty:
+        df = pd.DataFrame(columns=["Médico"] + nombres)
+    else:
+        matriz = acumulado.unstack(fill_value=0.0).reindex(columns=nombres, fill_value=0.0)
+        matriz.columns.name = None
+        df = matriz.reset_index(names="Médico")
+    df.insert(1, "Nivel", [nivel_de.get(m, nivel_fichero.get(m, "Sin nivel")) for m in df["Médico"]])
+    df[nombres] = df[nombres].astype(float)
+    return df
+
+
+def agregar_facturacion(bloques, servicios, niveles=None, alias_servicios=None):
+    """Agrega las líneas de facturación en la matriz médico × servicio.
+
+    Devuelve el DataFrame con el formato del editor (Médico, Nivel y una
+    columna por servicio) y un resumen de la importación. El nivel se toma de
+    `niveles` y, si el médico no aparece ahí, de la columna Nivel del fichero.
+    `alias_servicios` traduce nombres alternativos de servicio (p. ej. "MQX").
+    """
+    nombres = list(servicios.keys())
+    nivel_de = {m: n for n, lista in (niveles or {}).items() for m in lista}
+    acumulado, nivel_fichero, informe = _acumular(bloques, nombres, False, alias_servicios)
+
+    df = _tabla_editor(acumulado, nombres, nivel_de, nivel_fichero)
+    informe["medicos"] = len(df)
+    informe["importe_importado"] = float(df[nombres].to_numpy(dtype=float).sum())
+    return df, informe
+
+
+def agregar_facturacion_por_periodo(bloques, servicios, niveles=None, alias_servicios=None):
+    # Igual que agregar_facturacion, pero con una matriz por mes (columna Fecha)
+    nombres = list(servicios.keys())
+    nivel_de = {m: n for n, lista in (niveles or {}).items() for m in lista}
+    acumulado, nivel_fichero, informe = _acumular(bloques, nombres, True, alias_servicios)
+
+    por_periodo = {}
+    if acumulado is not None:
+        for periodo, parcial in acumulado.groupby(level=0):
+            por_periodo[periodo] = _tabla_editor(parcial.droplevel(0), nombres, nivel_de, nivel_fichero)
+    informe["periodos"] = sorted(por_periodo)
+    informe["medicos"] = len({m for df in por_periodo.values() for m in df["Médico"]})
+    informe["importe_importado"] = float(sum(df[nombres].to_numpy(dtype=float).sum() for df in por_periodo.values()))
+    return por_periodo, informe
+
+
+def importar_facturacion(fichero, servicios, niveles=None, nombre=None, filas_por_bloque=FILAS_POR_BLOQUE,
+                         por_periodo=False, alias_servicios=None):
+    bloques = leer_bloques(fichero, nombre, filas_por_bloque)
+    if por_periodo:
+        return agregar_facturacion_por_periodo(bloques, servicios, niveles, alias_servicios)
+    return agregar_facturacion(bloques, servicios, niveles, alias_servicios)
+
+
+def combinar_con_plantilla(df_base, df_importado):
+    # Médicos de la plantilla primero (con sus importes importados, o 0) y
+    # después los que solo aparecen en el fichero
+    nombres = [c for c in df_base.columns if c not in ("Médico", "Nivel")]
+    importados = df_importado.set_index("Médico")
+    base = df_base.set_index("Médico")
+    base[nombres] = importados[nombres].reindex(base.index).fillna(0.0).to_numpy()
+    nuevos = importados.loc[~importados.index.isin(base.index), ["Nivel"] + nombres]
+    return pd.concat([base, nuevos]).reset_index(names="Médico")[df_base.columns]
@@ -0,0 +1,173 @@
+from bisect import bisect_right, insort
+
+import numpy as np
+
+from motor.distribucion import (
+    calcular_distribucion, matriz_facturacion, resumen_distribucion, tablas_resultados, vectores_reparto
+)
+from motor.config import configuracion
+from motor.medicos import IndiceMedicos
+from motor.reglas import SumaExacta, codigos_nivel
+
+# -------------------- Distribución incremental --------------------
+# Al editar una celda solo cambian la fila de ese médico y el promedio de su
+# nivel. Se mantienen sumas exactas (SumaExacta) y conteos por nivel, así el
+# promedio se actualiza con el delta de la edición y coincide con el del motor
+# vectorizado (un médico justo en el promedio cae en el mismo tramo en los
+# dos). Por nivel se mantienen los brutos ordenados: al moverse el promedio
+# solo se reevalúan los médicos cuyo bruto queda entre el promedio anterior y
+# el nuevo (los únicos que pueden cambiar de tramo).
+
+# Si cambian más filas que estas (pegar un bloque, una importación) se
+# recalcula todo con el motor vectorizado
+MAX_FILAS_INCREMENTAL = 1
+
+
+class DistribucionIncremental:
+    """Distribución VITHAS-OSA que se actualiza a partir de los cambios de celda."""
+
+    def __init__(self, df, servicios, solo_positivos=False, reglas=None):
+        self.servicios = servicios
+        self.solo_positivos = solo_positivos
+        self.reglas = reglas if reglas is not None else configuracion()["reglas"]
+        self.nombres, self.pct_vithas, self.pct_osa = vectores_reparto(servicios)
+        self.recalculos_completos = 0
+        self.filas_actualizadas = 0
+        self._identidad = df[["Médico", "Nivel"]].reset_index(drop=True)
+        # Mientras la plantilla sea compatible las posiciones de cada médico no cambian
+        self.indice = IndiceMedicos(self._identidad)
+        self.codigos = codigos_nivel(self.reglas, self._identidad["Nivel"])
+        self._inicializar(df)
+
+    def _inicializar(self, df):
+        # Estado completo desde el motor vectorizado (misma plantilla)
+        df_calc, resumen = calcular_distribucion(df, self.servicios, self.solo_positivos, self.reglas)
+        self.recalculos_completos += 1
+
+        self.matriz = df_calc[self.nombres].to_numpy(dtype=float).copy()
+        self.bruto = df_calc["Total_Bruto"].to_numpy(dtype=float).copy()
+        self.osa = df_calc["Total_OSA_Disponible"].to_numpy(dtype=float).copy()
+        self.vithas = df_calc["Total_VITHAS"].to_numpy(dtype=float).copy()
+        self.pct = df_calc["Pct_Abono"].to_numpy(dtype=float).copy()
+        self.abonado = df_calc["Abonado_a_Medico"].to_numpy(dtype=float).copy()
+
+        n_niveles = len(self.reglas["niveles"])
+        cuenta = self._cuenta(self.bruto)
+        self.sumas = [SumaExacta(self.bruto[cuenta & (self.codigos == c)].tolist()) for c in range(n_niveles)]
+        self.conteos = np.bincount(self.codigos[cuenta & (self.codigos >= 0)], minlength=n_niveles)
+        self.promedios = np.array([resumen["promedios_nivel"][n] for n in self.reglas["niveles"]])
+        self.ordenados = []
+        for c in range(n_niveles):
+            # Pares (bruto, fila) ordenados; el orden estable desempata por fila
+            filas = np.flatnonzero(self.codigos == c)
+            filas = filas[np.argsort(self.bruto[filas], kind="stable")]
+            self.ordenados.append(list(zip(self.bruto[filas].tolist(), filas.tolist())))
+
+    def _cuenta(self, bruto):
+        # Qué médicos entran en el promedio de su nivel
+        return bruto > 0 if self.solo_positivos else np.ones(np.shape(bruto), dtype=bool)
+
+    def _pct_de(self, i):
+        c = self.codigos[i]
+        if c < 0 or (self.solo_positivos and self.bruto[i] == 0):
+            return 0.0
+        return float(self.reglas["tabla"][c, int(self.bruto[i] > self.promedios[c])])
+
+    def compatible(self, df, servicios):
+        # Misma plantilla (médicos y niveles en el mismo orden) y mismos repartos
+        if servicios != self.servicios or len(df) != len(self._identidad):
+            return False
+        return (
+            np.array_equal(df["Médico"].to_numpy(dtype=object), self._identidad["Médico"].to_numpy(dtype=object))
+            and np.array_equal(df["Nivel"].to_numpy(dtype=object), self._identidad["Nivel"].to_numpy(dtype=object))
+        )
+
+    def editar(self, i, fila):
+        """Aplica los nuevos importes de la fila `i`; devuelve los médicos reevaluados."""
+        fila = np.asarray(fila, dtype=float)
+        self.matriz[i] = fila
+
+        bruto_anterior = self.bruto[i]
+        # Misma suma, servicio a servicio, que el motor vectorizado
+        bruto = osa = vithas = 0.0
+        for j in range(len(fila)):
+            bruto += fila[j]
+            osa += fila[j] * self.pct_osa[j]
+            vithas += fila[j] * self.pct_vithas[j]
+        self.bruto[i], self.osa[i], self.vithas[i] = bruto, osa, vithas
+
+        afectados = {i}
+        c = self.codigos[i]
+        if c >= 0:
+            ordenados = self.ordenados[c]
+            del ordenados[bisect_right(ordenados, (bruto_anterior, i)) - 1]
+            insort(ordenados, (bruto, i))
+
+            # Suma y conteo del nivel a partir del delta de la edición
+            if self._cuenta(bruto_anterior):
+                self.sumas[c].sumar(-bruto_anterior)
+                self.conteos[c] -= 1
+            if self._cuenta(bruto):
+                self.sumas[c].sumar(bruto)
+                self.conteos[c] += 1
+            promedio_anterior = self.promedios[c]
+            self.promedios[c] = self.sumas[c].valor() / self.conteos[c] if self.conteos[c] else 0.0
+
+            # Solo cambian de tramo los brutos en (min(promedios), max(promedios)]
+            bajo, alto = sorted((promedio_anterior, self.promedios[c]))
+            if bajo != alto:
+                desde = bisect_right(ordenados, (bajo, float("inf")))
+                hasta = bisect_right(ordenados, (alto, float("inf")))
+                afectados.update(j for _, j in ordenados[desde:hasta])
+
+        for j in afectados:
+            pct = self._pct_de(j)
+            self.pct[j], self.abonado[j] = pct, self.osa[j] * pct
+        self.filas_actualizadas += 1
+        return afectados
+
+    def aplicar_cambios(self, df):
+        # Compara con la matriz guardada y aplica solo las filas modificadas
+        nueva = matriz_facturacion(df, self.nombres)
+        filas = np.flatnonzero((nueva != self.matriz).any(axis=1))
+        if len(filas) > MAX_FILAS_INCREMENTAL:
+            self._inicializar(df)
+            return len(filas)
+        for i in filas:
+            self.editar(i, nueva[i])
+        return len(filas)
+
+    def resultados(self):
+        # Mismo formato que calcular_resultados (DataFrames nuevos en cada llamada)
+        df_calc = self._identidad.copy()
+        for j, s in enumerate(self.nombres):
+            df_calc[s] = self.matriz[:, j]
+        df_calc["Total_Bruto"] = self.bruto
+        df_calc["Total_VITHAS"] = self.vithas
+        df_calc["Total_OSA_Disponible"] = self.osa
+        df_calc["Pct_Abono"] = self.pct
+        df_calc["Abonado_a_Medico"] = self.abonado
+        df_calc["Queda_en_OSA_por_medico"] = self.osa - self.abonado
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diferencia = self.abonado / self.bruto - 1
+        df_calc["Diferencia_%"] = np.where(np.isfinite(diferencia), diferencia, 0.0)
+        df_calc = df_calc.copy()
+
+        # Totales con las mismas sumas que calcular_distribucion, sobre los arrays guardados
+        resumen = resumen_distribucion(
+            self.nombres, self.matriz.sum(axis=0), self.pct_vithas, self.pct_osa,
+            float(self.bruto.sum()), dict(zip(self.reglas["niveles"], self.promedios.tolist())),
+            float(self.abonado.sum())
+        )
+        return tablas_resultados(df_calc, resumen, self.servicios, self.indice)
+
+
+def resultados_incrementales(session_state, nombre, df, servicios, solo_positivos=False, reglas=None):
+    """Resultados de `df` reutilizando el estado incremental guardado en `session_state[nombre]`."""
+    motor = session_state.get(nombre)
+    if motor is None or motor.solo_positivos != solo_positivos or not motor.compatible(df, servicios):
+        motor = DistribucionIncremental(df, servicios, solo_positivos, reglas)
+        session_state[nombre] = motor
+    else:
+        motor.aplicar_cambios(df)
+    return motor.resultados()
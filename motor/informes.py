@@ -0,0 +1,217 @@
+import os
+import re
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html import escape
+from string import Template
+
+from motor.reglas import pct_nivel
+
+# -------------------- Informes por médico en lote --------------------
+# El mismo contenido que el reporte de la página Escalabilidad (tarjetas,
+# potencial de ingresos, desglose por servicio y comparativa) para toda la
+# plantilla. Las plantillas HTML se compilan una vez al importar el módulo (una
+# vez por proceso), los médicos se reparten en lotes entre procesos y cada
+# informe se escribe en el zip en cuanto llega, sin acumularlos en memoria.
+
+MEDICOS_POR_LOTE = 200
+COLUMNAS_INFORME = ["Médico", "Nivel", "Total_Bruto", "Total_VITHAS", "Total_OSA_Disponible"]
+
+_PAGINA = Template("""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Reporte de Rendimiento - Dr. $medico</title>
+<style>
+body { font-family: Arial, Helvetica, sans-serif; color: #263238; margin: 30px; }
+h1 { background: #023004; color: white; padding: 18px; border-radius: 12px; text-align: center; font-size: 1.6rem; }
+h2 { border-bottom: 2px solid #2e7d32; padding-bottom: 4px; margin-top: 28px; }
+.fila { display: flex; gap: 12px; flex-wrap: wrap; }
+.tarjeta { flex: 1; min-width: 150px; padding: 14px; border-radius: 10px; color: white; text-align: center; }
+.tarjeta h4 { margin: 0; font-size: 0.95rem; }
+.tarjeta .valor { margin: 6px 0; font-size: 1.5rem; font-weight: bold; }
+.tarjeta p { margin: 0; font-size: 0.85rem; }
+.aviso { padding: 12px; border-radius: 5px; margin: 10px 0; }
+table { border-collapse: collapse; width: 100%; margin-top: 10px; }
+th, td { border: 1px solid #cfd8dc; padding: 6px 10px; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+th { background: #e8f5e9; }
+</style>
+</head>
+<body>
+<h1>ORTHOPAEDIC SPECIALIST ALLIANCE ⚕<br><small>Reporte de Rendimiento del Médico - Dr. $medico</small></h1>
+<p><strong>Nivel:</strong> $nivel &nbsp;·&nbsp; <strong>Promedio de facturación del nivel:</strong> $promedio_nivel €</p>
+$mensaje
+<div class="fila">
+  <div class="tarjeta" style="background:#2e7d32"><h4>Facturación Total</h4><div class="valor">$total_bruto €</div></div>
+  <div class="tarjeta" style="background:#00897b"><h4>Parte VITHAS</h4><div class="valor">$total_vithas €</div></div>
+  <div class="tarjeta" style="background:#43a047"><h4>Abonado al Médico</h4><div class="valor">$abono_actual €</div><p>($porcentaje_actual% de la facturación)</p></div>
+  <div class="tarjeta" style="background:#689f38"><h4>OSA Final</h4><div class="valor">$osa_final €</div></div>
+</div>
+<h2>📈 Potencial de Ingresos</h2>
+<div class="fila">
+  $tarjeta_potencial
+  <div class="tarjeta" style="background:#1976d2"><h4>Abono potencial máximo</h4><div class="valor">$abono_potencial €</div><p>($porcentaje_potencial% de la facturación)</p></div>
+</div>
+<h2>📊 Comparativa de Potencial</h2>
+$grafico
+<h2>🧮 Desglose por Servicio</h2>
+$tabla_servicios
+$sin_facturacion
+</body>
+</html>
+""")
+
+_MENSAJE_ENCIMA = Template("""<div class="aviso" style="background:#d4edda;color:#155724;border-left:4px solid #28a745"><strong>¡EXCELENTE RENDIMIENTO!</strong> Doctor $medico, usted está por <strong>ENCIMA</strong> del promedio de facturación de su grupo.</div>""")
+_MENSAJE_DEBAJO = Template("""<div class="aviso" style="background:#fff3cd;color:#856404;border-left:4px solid #ffc107"><strong>ATENCIÓN:</strong> Doctor $medico, usted está por <strong>DEBAJO</strong> del promedio de facturación de su grupo.</div>""")
+_TARJETA_NO_ALCANZADO = Template("""<div class="tarjeta" style="background:#ef6c00"><h4>Potencial no alcanzado</h4><div class="valor">$diferencia €</div><p>Por no superar el promedio de su nivel</p></div>""")
+_TARJETA_ALCANZADO = Template("""<div class="tarjeta" style="background:#43a047"><h4>¡Meta alcanzada!</h4><div class="valor">$abono_potencial €</div><p>Ha superado el promedio de su nivel</p></div>""")
+_BARRA = Template("""<g><text x="0" y="$y_texto" font-size="13">$etiqueta</text><rect x="90" y="$y" width="$ancho" height="26" fill="$color"></rect><text x="$x_valor" y="$y_texto" font-size="13">$valor €</text></g>""")
+_FILA_SERVICIO = Template("""<tr><td>$servicio</td><td>$facturado €</td><td>$abonado €</td><td>$porcentaje%</td></tr>""")
+
+
+def _euros(valor):
+    return f"{valor:,.2f}"
+
+
+def _grafico_comparativa(abono_actual, abono_potencial):
+    # Barras horizontales en SVG (sin Plotly ni navegador: vale también para PDF)
+    maximo = max(abono_actual, abono_potencial, 1e-9)
+    barras = []
+    for i, (etiqueta, valor, color) in enumerate([("Actual", abono_actual, "#43a047"),
+                                                   ("Potencial", abono_potencial, "#1976d2")]):
+        ancho = 380 * valor / maximo
+        barras.append(_BARRA.substitute(
+            y=10 + i * 40, y_texto=28 + i * 40, etiqueta=etiqueta, ancho=f"{ancho:.1f}", color=color,
+            x_valor=f"{96 + ancho:.1f}", valor=_euros(valor)
+        ))
+    return f'<svg width="600" height="90" xmlns="http://www.w3.org/2000/svg">{"".join(barras)}</svg>'
+
+
+def datos_informe(fila, promedio_nivel, reglas, servicios):
+    """Cifras del reporte de un médico (mismas reglas que la página Escalabilidad)."""
+    bruto = float(fila["Total_Bruto"])
+    osa = float(fila["Total_OSA_Disponible"])
+    pct_debajo, pct_encima = pct_nivel(reglas, fila["Nivel"])
+    pct_actual = pct_debajo if bruto <= promedio_nivel else pct_encima
+    abono_actual = osa * pct_actual
+    abono_potencial = osa * pct_encima
+
+    por_servicio = []
+    for servicio, reparto in servicios.items():
+        facturado = float(fila[servicio])
+        if facturado > 0:
+            abonado = facturado * reparto["OSA"] * pct_actual
+            por_servicio.append((servicio, facturado, abonado, abonado / facturado * 100))
+    return {
+        "medico": fila["Médico"],
+        "nivel": fila["Nivel"],
+        "promedio_nivel": promedio_nivel,
+        "encima": bruto > promedio_nivel,
+        "total_bruto": bruto,
+        "total_vithas": float(fila["Total_VITHAS"]),
+        "abono_actual": abono_actual,
+        "abono_potencial": abono_potencial,
+        "diferencia": abono_potencial - abono_actual,
+        "porcentaje_actual": abono_actual / bruto * 100 if bruto > 0 else 0.0,
+        "porcentaje_potencial": abono_potencial / bruto * 100 if bruto > 0 else 0.0,
+        "osa_final": osa - abono_actual,
+        "por_servicio": por_servicio,
+        "sin_facturacion": [s for s in servicios if float(fila[s]) == 0],
+    }
+
+
+def informe_html(datos):
+    medico = escape(str(datos["medico"]))
+    mensaje = (_MENSAJE_ENCIMA if datos["encima"] else _MENSAJE_DEBAJO).substitute(medico=medico)
+    if datos["diferencia"] > 0:
+        tarjeta_potencial = _TARJETA_NO_ALCANZADO.substitute(diferencia=_euros(datos["diferencia"]))
+    else:
+        tarjeta_potencial = _TARJETA_ALCANZADO.substitute(abono_potencial=_euros(datos["abono_potencial"]))
+
+    if datos["por_servicio"]:
+        filas = "".join(
+            _FILA_SERVICIO.substitute(servicio=escape(s), facturado=_euros(f), abonado=_euros(a), porcentaje=f"{p:.1f}")
+            for s, f, a, p in datos["por_servicio"]
+        )
+        tabla_servicios = f"<table><tr><th>Servicio</th><th>Facturado</th><th>Abonado</th><th>% Abono</th></tr>{filas}</table>"
+    else:
+        tabla_servicios = "<p>Sin facturación en el periodo.</p>"
+    sin_facturacion = (
+        f"<p><strong>Servicios sin facturación:</strong> {escape(', '.join(datos['sin_facturacion']))}</p>"
+        if datos["sin_facturacion"] else ""
+    )
+    return _PAGINA.substitute(
+        medico=medico, nivel=escape(str(datos["nivel"])), promedio_nivel=_euros(datos["promedio_nivel"]),
+        mensaje=mensaje, total_bruto=_euros(datos["total_bruto"]), total_vithas=_euros(datos["total_vithas"]),
+        abono_actual=_euros(datos["abono_actual"]), porcentaje_actual=f"{datos['porcentaje_actual']:.1f}",
+        osa_final=_euros(datos["osa_final"]), tarjeta_potencial=tarjeta_potencial,
+        abono_potencial=_euros(datos["abono_potencial"]), porcentaje_potencial=f"{datos['porcentaje_potencial']:.1f}",
+        grafico=_grafico_comparativa(datos["abono_actual"], datos["abono_potencial"]),
+        tabla_servicios=tabla_servicios, sin_facturacion=sin_facturacion,
+    )
+
+
+def pdf_disponible():
+    # PDF opcional: hace falta weasyprint (y sus librerías del sistema)
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def _nombre_fichero(posicion, medico):
+    texto = unicodedata.normalize("NFKD", str(medico)).encode("ascii", "ignore").decode()
+    return f"{posicion:05d}_{re.sub(r'[^A-Za-z0-9]+', '_', texto).strip('_') or 'medico'}"
+
+
+def _generar_lote(args):
+    inicio, filas, promedios_nivel, reglas, servicios, pdf = args
+    if pdf:
+        from weasyprint import HTML
+    salida = []
+    for i, fila in enumerate(filas):
+        html = informe_html(datos_informe(fila, promedios_nivel.get(fila["Nivel"], 0.0), reglas, servicios))
+        nombre = _nombre_fichero(inicio + i, fila["Médico"])
+        salida.append((f"html/{nombre}.html", html.encode("utf-8")))
+        if pdf:
+            salida.append((f"pdf/{nombre}.pdf", HTML(string=html).write_pdf()))
+    return salida
+
+
+def generar_informes(df_calc, promedios_nivel, reglas, servicios, destino, pdf=False, procesos=None,
+                     progreso=None, medicos_por_lote=MEDICOS_POR_LOTE):
+    """Escribe en el zip `destino` (ruta u objeto fichero) el informe de cada médico.
+
+    `progreso(hechos, total)` se llama al terminar cada lote. Devuelve el
+    número de informes generados.
+    """
+    columnas = COLUMNAS_INFORME + list(servicios)
+    filas = df_calc[columnas].to_dict("records")
+    total = len(filas)
+    tareas = [
+        (inicio, filas[inicio:inicio + medicos_por_lote], promedios_nivel, reglas, servicios, pdf)
+        for inicio in range(0, total, medicos_por_lote)
+    ]
+    procesos = max(1, min(procesos or os.cpu_count() or 1, len(tareas) or 1))
+
+    hechos = 0
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        def escribir(lote):
+            nonlocal hechos
+            for nombre, contenido in lote:
+                zf.writestr(nombre, contenido)
+            hechos += sum(1 for nombre, _ in lote if nombre.startswith("html/"))
+            if progreso:
+                progreso(hechos, total)
+
+        if procesos == 1:
+            for tarea in tareas:
+                escribir(_generar_lote(tarea))
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                for futuro in as_completed([pool.submit(_generar_lote, t) for t in tareas]):
+                    escribir(futuro.result())
+    return hechos
@@ -0,0 +1,135 @@
+import os
+import time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from motor.config import cargar_config, configuracion, plantilla_facturacion
+from motor.distribucion import calcular_resultados
+from motor.exportar import columnas_detalle, escribir_excel, hojas_resultados
+from motor.importar import ErrorImportacion, combinar_con_plantilla, importar_facturacion
+
+# -------------------- Cierre mensual por lotes --------------------
+# Mismo cálculo que la página Distribución VITHAS-OSA, sin Streamlit: cada
+# fichero de facturación (un centro y un periodo) se importa, se reparte y se
+# escribe en su propio Excel con las cuatro hojas del informe. Los ficheros se
+# reparten entre procesos; cada proceso carga la configuración una sola vez.
+
+EXTENSIONES = (".csv", ".txt", ".xlsx", ".xlsm", ".parquet", ".pq")
+
+
+def ficheros_facturacion(entrada):
+    # Ficheros de facturación de `entrada` (directorio o fichero suelto), en orden
+    entrada = Path(entrada)
+    if entrada.is_file():
+        return [entrada]
+    return sorted(p for p in entrada.iterdir() if p.is_file() and p.suffix.lower() in EXTENSIONES)
+
+
+@lru_cache(maxsize=None)
+def _config(ruta_config):
+    # Una carga por proceso y ruta
+    return cargar_config(ruta_config) if ruta_config else configuracion()
+
+
+def _destinos(ficheros, salida):
+    # <nombre>.xlsx; si dos ficheros comparten nombre (a.csv y a.xlsx) se añade
+    # la extensión para que no se pisen
+    nombres = [r.stem.lower() for r in ficheros]
+    return {
+        r: Path(salida) / (f"{r.stem}.xlsx" if nombres.count(r.stem.lower()) == 1 else f"{r.stem}_{r.suffix[1:]}.xlsx")
+        for r in ficheros
+    }
+
+
+def procesar_fichero(ruta, salida, ruta_config=None, esquema=None, con_plantilla=False, centimos=False, destino=None):
+    """Importa `ruta`, calcula la distribución y escribe `salida`/<nombre>.xlsx (o `destino`).
+
+    Devuelve un informe con el fichero de destino, médicos, líneas leídas y
+    segundos empleados (o el error si el fichero no se pudo procesar). Un
+    fichero con error no detiene el lote.
+    """
+    inicio = time.perf_counter()
+    ruta = Path(ruta)
+    informe = {"fichero": str(ruta), "destino": None, "medicos": 0, "filas": 0, "error": None}
+    try:
+        config = _config(ruta_config)
+        servicios = config["servicios"]
+        df, importacion = importar_facturacion(ruta, servicios, config["niveles"],
+                                               alias_servicios=config["alias_servicios"])
+        if con_plantilla:
+            df = combinar_con_plantilla(plantilla_facturacion(config), df)
+
+        tramos = config["esquemas_tramos"][esquema] if esquema else None
+        resultados = calcular_resultados(df, servicios, tramos=tramos, centimos=centimos)
+        df_calc = resultados["df_edit"]
+        hojas = hojas_resultados(resultados["resumen"], resultados["serv_df"], resultados["nivel_df"],
+                                 df_calc[columnas_detalle(df_calc, servicios)])
+
+        destino = Path(destino) if destino else Path(salida) / f"{ruta.stem}.xlsx"
+        escribir_excel(str(destino), hojas)
+        informe.update(destino=str(destino), medicos=len(df_calc), filas=importacion["filas"])
+    except (ErrorImportacion, OSError, ValueError) as e:
+        informe["error"] = str(e)
+    except Exception as e:
+        # Cualquier otro fallo de un fichero queda en su informe y el lote sigue
+        informe["error"] = f"{type(e).__name__}: {e}"
+    informe["segundos"] = time.perf_counter() - inicio
+    return informe
+
+
+def procesar_directorio(entrada, salida, procesos=None, ruta_config=None, esquema=None, con_plantilla=False,
+                        al_terminar=None, centimos=False):
+    """Procesa todos los ficheros de `entrada` en paralelo.
+
+    `al_terminar(informe)` se llama a medida que termina cada fichero.
+    Devuelve los informes (en el orden de los ficheros) y un resumen con
+    ficheros, médicos, segundos y ritmo por segundo.
+    """
+    if esquema and esquema not in _config(ruta_config)["esquemas_tramos"]:
+        raise ValueError(f"Esquema de tramos desconocido: {esquema!r}")
+    ficheros = ficheros_facturacion(entrada)
+    destinos = _destinos(ficheros, salida)
+    Path(salida).mkdir(parents=True, exist_ok=True)
+
+    inicio = time.perf_counter()
+    informes = {}
+    procesos = max(1, min(procesos or os.cpu_count() or 1, len(ficheros) or 1))
+    if procesos == 1:
+        for ruta in ficheros:
+            informes[ruta] = procesar_fichero(ruta, salida, ruta_config, esquema, con_plantilla, centimos,
+                                              destinos[ruta])
+            if al_terminar:
+                al_terminar(informes[ruta])
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = {
+                pool.submit(procesar_fichero, ruta, salida, ruta_config, esquema, con_plantilla, centimos,
+                            destinos[ruta]): ruta
+                for ruta in ficheros
+            }
+            for futuro in as_completed(futuros):
+                try:
+                    informes[futuros[futuro]] = futuro.result()
+                except Exception as e:
+                    # El proceso no llegó a devolver informe (p. ej. se cerró): fallo de ese fichero
+                    informes[futuros[futuro]] = {"fichero": str(futuros[futuro]), "destino": None, "medicos": 0,
+                                                 "filas": 0, "error": f"{type(e).__name__}: {e}", "segundos": 0.0}
+                if al_terminar:
+                    al_terminar(informes[futuros[futuro]])
+    segundos = time.perf_counter() - inicio
+
+    informes = [informes[ruta] for ruta in ficheros]
+    correctos = [i for i in informes if i["error"] is None]
+    medicos = sum(i["medicos"] for i in correctos)
+    resumen = {
+        "ficheros": len(correctos),
+        "errores": len(informes) - len(correctos),
+        "medicos": medicos,
+        "filas": sum(i["filas"] for i in correctos),
+        "segundos": segundos,
+        "procesos": procesos,
+        "ficheros_por_segundo": len(correctos) / segundos if segundos else 0.0,
+        "medicos_por_segundo": medicos / segundos if segundos else 0.0,
+    }
+    return informes, resumen
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# -------------------- Índice de médicos --------------------
+# Posición de cada médico y de cada nivel en la tabla de resultados, para
+# consultas directas en lugar de recorrer la columna Médico con una máscara
+# por cada búsqueda. Mientras la plantilla no cambie (mismos médicos en el
+# mismo orden) el índice se reutiliza sobre las tablas nuevas con `sobre`.
+
+
+class IndiceMedicos:
+    """Acceso por Médico y por Nivel a las filas de una tabla de médicos."""
+
+    def __init__(self, df, _posiciones=None):
+        self.df = df
+        if _posiciones is None:
+            _posiciones = self._indexar(df)
+        self._posicion, self._medicos, self._por_nivel = _posiciones
+
+    @staticmethod
+    def _indexar(df):
+        medicos = df["Médico"].to_numpy(dtype=object)
+        # Si un médico se repite cuenta la primera fila (como .iloc[0] sobre la máscara)
+        posicion = dict(zip(medicos[::-1].tolist(), range(len(medicos) - 1, -1, -1)))
+        orden_medicos = list(dict.fromkeys(medicos.tolist()))
+        codigos, niveles = pd.factorize(df["Nivel"])
+        orden = np.argsort(codigos, kind="stable")
+        cortes = np.searchsorted(codigos[orden], np.arange(len(niveles) + 1))
+        por_nivel = {nivel: orden[cortes[i]:cortes[i + 1]] for i, nivel in enumerate(niveles)}
+        return posicion, orden_medicos, por_nivel
+
+    def sobre(self, df):
+        # Mismo índice sobre otra tabla con los mismos médicos en el mismo orden
+        return IndiceMedicos(df, (self._posicion, self._medicos, self._por_nivel))
+
+    def __len__(self):
+        return len(self._posicion)
+
+    def __contains__(self, medico):
+        return medico in self._posicion
+
+    def medicos(self):
+        # Médicos distintos en el orden de la tabla (como df["Médico"].unique())
+        return self._medicos
+
+    def niveles(self):
+        return list(self._por_nivel)
+
+    def posicion(self, medico):
+        return self._posicion[medico]
+
+    def fila(self, medico):
+        return self.df.iloc[self._posicion[medico]]
+
+    def filas(self, medicos):
+        return self.df.iloc[[self._posicion[m] for m in medicos]]
+
+    def nivel(self, nivel):
+        # Filas de un nivel, en el orden de la tabla (vacío si no hay médicos de ese nivel)
+        return self.df.iloc[self._por_nivel.get(nivel, np.array([], dtype=np.intp))]
@@ -0,0 +1,35 @@
+import math
+
+import numpy as np
+
+# -------------------- Tablas paginadas en el servidor --------------------
+# El filtro, el orden y el corte de página se hacen aquí con pandas/numpy y al
+# navegador solo viaja la página visible, no la plantilla completa.
+
+
+def pagina_tabla(df, busqueda="", columna_busqueda="Médico", filtros=None, orden=None, ascendente=True,
+                 pagina=1, filas_por_pagina=50):
+    """Filtra, ordena y devuelve una página de `df`.
+
+    `filtros` es {columna: valores admitidos} (lista vacía = sin filtro) y
+    `orden` una lista de columnas. Devuelve (filas de la página, filas tras
+    filtrar, número de páginas, página mostrada).
+    """
+    seleccion = np.ones(len(df), dtype=bool)
+    if busqueda:
+        seleccion &= df[columna_busqueda].astype(str).str.contains(busqueda, case=False, regex=False).to_numpy()
+    for columna, valores in (filtros or {}).items():
+        if valores:
+            seleccion &= df[columna].isin(valores).to_numpy()
+    posiciones = np.flatnonzero(seleccion)
+
+    if orden:
+        # Se ordenan solo las columnas de orden y se reordenan las posiciones
+        claves = df[orden].iloc[posiciones].reset_index(drop=True)
+        posiciones = posiciones[claves.sort_values(orden, ascending=ascendente, kind="mergesort").index.to_numpy()]
+
+    total = len(posiciones)
+    paginas = max(1, math.ceil(total / filas_por_pagina))
+    pagina = min(max(1, int(pagina)), paginas)
+    inicio = (pagina - 1) * filas_por_pagina
+    return df.iloc[posiciones[inicio:inicio + filas_por_pagina]], total, paginas, pagina
@@ -0,0 +1,139 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+# -------------------- Perfil de reejecuciones --------------------
+# Cada ejecución de una página se parte en secciones con nombre: `seccion()`
+# cierra la anterior y abre la siguiente, así una página de script solo
+# necesita una llamada en cada cabecera de sección. Se guardan las últimas
+# ejecuciones por página en la sesión para compararlas o volcarlas a JSON.
+# Las reejecuciones parciales (st.fragment) se anotan como ejecuciones propias.
+# Las descargas generadas con callables corren en otro hilo: lo que escriben
+# va a la ejecución en la que se crearon y todas las escrituras pasan por un
+# cerrojo.
+
+
+class PerfilEjecuciones:
+    """Tiempos por sección de las últimas `max_ejecuciones` ejecuciones de una página."""
+
+    def __init__(self, pagina, max_ejecuciones=20):
+        self.pagina = pagina
+        self._ejecuciones = deque(maxlen=max_ejecuciones)
+        self._actual = None
+        self._abierta = None
+        self._cerrojo = threading.Lock()
+
+    def iniciar(self, fragmento=None):
+        self._cerrar_seccion()
+        self._actual = {"ejecucion": datetime.now().isoformat(timespec="seconds"), "secciones": []}
+        if fragmento:
+            self._actual["fragmento"] = fragmento
+        with self._cerrojo:
+            self._ejecuciones.append(self._actual)
+        self._abierta = None
+
+    def seccion(self, nombre):
+        # Cierra la sección abierta y empieza `nombre`
+        if self._actual is None:
+            self.iniciar()
+        self._cerrar_seccion()
+        self._abierta = (nombre, time.perf_counter())
+
+    def _cerrar_seccion(self):
+        if self._abierta is not None:
+            nombre, inicio = self._abierta
+            with self._cerrojo:
+                self._actual["secciones"].append({"seccion": nombre, "ms": (time.perf_counter() - inicio) * 1000})
+            self._abierta = None
+
+    def terminar(self):
+        self._cerrar_seccion()
+        self._actual = None
+
+    def fragmento(self, funcion):
+        # Decorador para las funciones de st.fragment: dentro de la ejecución
+        # completa sus secciones cuentan en ella; cuando solo se reejecuta el
+        # fragmento, abre y cierra una ejecución propia
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            parcial = self._actual is None
+            if parcial:
+                self.iniciar(fragmento=funcion.__name__)
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                if parcial:
+                    self.terminar()
+        return envoltura
+
+    def medir(self, nombre, funcion):
+        # Envuelve `funcion` (p. ej. la generación de la descarga, que corre
+        # fuera del script y en otro hilo) y anota su tiempo en la ejecución
+        # en curso al crear la envoltura, aunque ya haya empezado otra
+        with self._cerrojo:
+            ejecucion = self._actual or (self._ejecuciones[-1] if self._ejecuciones else None)
+
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                if ejecucion is not None:
+                    with self._cerrojo:
+                        ejecucion["secciones"].append({"seccion": nombre, "ms": (time.perf_counter() - inicio) * 1000})
+        return medida
+
+    def ejecuciones(self):
+        # Copia tomada bajo el cerrojo: se puede recorrer mientras otro hilo anota
+        with self._cerrojo:
+            return [dict(e, secciones=list(e["secciones"])) for e in self._ejecuciones]
+
+    def tabla(self, ultimas=None):
+        # Ejecución × sección (ms), de la más reciente a la más antigua
+        ejecuciones = self.ejecuciones()[-ultimas:] if ultimas else self.ejecuciones()
+        filas = []
+        for e in reversed(ejecuciones):
+            fila = {"Ejecución": e["ejecucion"] + (f" ({e['fragmento']})" if e.get("fragmento") else "")}
+            for s in e["secciones"]:
+                fila[s["seccion"]] = fila.get(s["seccion"], 0.0) + s["ms"]
+            fila["Total"] = sum(s["ms"] for s in e["secciones"])
+            filas.append(fila)
+        tabla = pd.DataFrame(filas)
+        # Total al final aunque la primera fila sea de un fragmento
+        return tabla[[c for c in tabla.columns if c != "Total"] + ["Total"]] if filas else tabla
+
+    def json(self):
+        return json.dumps({"pagina": self.pagina, "ejecuciones": self.ejecuciones()}, ensure_ascii=False, indent=2)
+
+
+def perfil_sesion(session_state, pagina, max_ejecuciones=20):
+    # Perfil de `pagina` guardado en la sesión; empieza una ejecución nueva
+    nombre = f"perfil_{pagina}"
+    if nombre not in session_state:
+        session_state[nombre] = PerfilEjecuciones(pagina, max_ejecuciones)
+    perfil = session_state[nombre]
+    perfil.iniciar()
+    return perfil
+
+
+def panel_perfil(perfil, ultimas=10):
+    """Panel plegable en la barra lateral con las últimas ejecuciones y descarga JSON."""
+    import streamlit as st
+
+    perfil.terminar()
+    with st.sidebar.expander("⏱️ Perfil de ejecución"):
+        tabla = perfil.tabla(ultimas)
+        if tabla.empty:
+            st.caption("Sin ejecuciones registradas.")
+            return
+        st.caption("Milisegundos por sección en las últimas ejecuciones (la primera fila es la actual).")
+        columnas_ms = [c for c in tabla.columns if c != "Ejecución"]
+        st.dataframe(tabla.style.format({c: "{:,.1f}" for c in columnas_ms}, na_rep="—"),
+                     use_container_width=True, hide_index=True)
+        st.download_button("📥 Descargar tiempos (JSON)", data=perfil.json,
+                           file_name=f"perfil_{perfil.pagina}.json", mime="application/json")
@@ -0,0 +1,178 @@
+import os
+import re
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+# -------------------- Historial de periodos (meses) --------------------
+# Cada periodo guarda su matriz de facturación y sus resultados ya calculados.
+# Editar un mes solo recalcula ese mes, y los acumulados se actualizan restando
+# lo que aportaba ese mes y sumando lo nuevo. La matriz de cada mes se guarda
+# además en disco (<directorio>/<AAAA-MM>.csv): al abrir una sesión nueva se
+# recuperan los meses anteriores.
+
+PATRON_PERIODO = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+DIRECTORIO_PERIODOS = Path(__file__).resolve().parent.parent / "datos" / "periodos"
+
+COLUMNAS_ACUMULADO = ['Total_Bruto', 'Total_VITHAS', 'Total_OSA_Disponible', 'Abonado_a_Medico', 'Queda_en_OSA_por_medico']
+
+
+def periodo_actual():
+    return date.today().strftime("%Y-%m")
+
+
+def periodo_valido(periodo):
+    return bool(PATRON_PERIODO.match(str(periodo)))
+
+
+def directorio_periodos():
+    # Se puede cambiar con la variable de entorno OSA_DIRECTORIO_PERIODOS
+    return Path(os.environ.get("OSA_DIRECTORIO_PERIODOS", DIRECTORIO_PERIODOS))
+
+
+def _fila_evolucion(periodo, resumen):
+    return {
+        'Periodo': periodo,
+        'Total_Bruto': resumen['total_bruto'],
+        'Total_VITHAS': resumen['total_vithas'],
+        'Total_OSA': resumen['total_osa'],
+        'Total_Abonado': resumen['total_abonado_a_medicos'],
+        'Saldo_OSA': resumen['osa_saldo_final'],
+        **{f'Promedio_{nivel}': promedio for nivel, promedio in resumen['promedios_nivel'].items()},
+    }
+
+
+def _aporte_medicos(resultados):
+    # Lo que un periodo suma a cada médico (y 1 en Periodos para saber cuándo deja de aparecer)
+    aporte = resultados["df_edit"].groupby(['Médico', 'Nivel'])[COLUMNAS_ACUMULADO].sum()
+    aporte['Periodos'] = 1
+    return aporte
+
+
+class HistorialPeriodos:
+    """Resultados por periodo con acumulados que se actualizan por diferencias.
+
+    Con `directorio` la matriz de cada periodo se guarda como CSV y los
+    periodos que ya había en el directorio quedan pendientes de calcular
+    (`pendientes()`).
+    """
+
+    def __init__(self, directorio=None):
+        self._periodos = {}
+        self._version = 0
+        self._evolucion = {}
+        self._acumulado_medicos = pd.DataFrame(
+            columns=COLUMNAS_ACUMULADO + ['Periodos'], dtype=float,
+            index=pd.MultiIndex.from_tuples([], names=['Médico', 'Nivel']),
+        )
+        self._acumulados = None
+        self._version_acumulados = -1
+        self.directorio = Path(directorio) if directorio is not None else None
+        self._en_disco = {}
+        if self.directorio is not None and self.directorio.is_dir():
+            for ruta in self.directorio.glob("*.csv"):
+                if periodo_valido(ruta.stem):
+                    self._periodos[ruta.stem] = None
+                    self._en_disco[ruta.stem] = ruta
+
+    def periodos(self):
+        return sorted(self._periodos)
+
+    def __contains__(self, periodo):
+        return periodo in self._periodos
+
+    def añadir(self, periodo):
+        if not periodo_valido(periodo):
+            raise ValueError(f"Periodo no válido: {periodo!r} (formato AAAA-MM)")
+        self._periodos.setdefault(periodo, None)
+
+    def clave(self, periodo):
+        entrada = self._periodos.get(periodo)
+        return entrada["clave"] if entrada else None
+
+    def pendientes(self):
+        # Periodos leídos del disco que aún no tienen resultados en esta sesión
+        return [p for p in self.periodos() if not self._periodos[p] and p in self._en_disco]
+
+    def facturacion(self, periodo, nombres_servicios):
+        # Matriz guardada del periodo en formato del editor (None si no hay)
+        columnas = ["Médico", "Nivel"] + list(nombres_servicios)
+        entrada = self._periodos.get(periodo)
+        if entrada:
+            return entrada["resultados"]["df_edit"][columnas].copy()
+        if periodo in self._en_disco:
+            guardada = pd.read_csv(self._en_disco[periodo], float_precision="round_trip")
+            # Servicios añadidos después de guardar el mes: 0
+            return guardada.reindex(columns=columnas).fillna({s: 0.0 for s in nombres_servicios})
+        return None
+
+    def resultados(self, periodo):
+        entrada = self._periodos.get(periodo)
+        return entrada["resultados"] if entrada else None
+
+    def registrar(self, periodo, clave, calcular, facturacion=None):
+        """Guarda los resultados de `periodo`; solo llama a `calcular` si cambió la huella.
+
+        `facturacion` (la matriz del periodo) se escribe en el directorio del
+        historial cada vez que los resultados cambian.
+        """
+        self.añadir(periodo)
+        entrada = self._periodos[periodo]
+        if entrada and entrada["clave"] == clave:
+            return entrada["resultados"]
+        resultados = calcular()
+        self._periodos[periodo] = {"clave": clave, "resultados": resultados}
+        self._actualizar_acumulados(periodo, entrada["resultados"] if entrada else None, resultados)
+        if facturacion is not None and self.directorio is not None:
+            self._guardar(periodo, facturacion)
+        return resultados
+
+    def eliminar(self, periodo):
+        entrada = self._periodos.pop(periodo, None)
+        if entrada is not None:
+            self._actualizar_acumulados(periodo, entrada["resultados"], None)
+        ruta = self._en_disco.pop(periodo, None)
+        if ruta is not None:
+            ruta.unlink(missing_ok=True)
+
+    def _guardar(self, periodo, facturacion):
+        # Se escribe en un temporal y se renombra: un fallo a medias no deja el mes corrupto
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        ruta = self.directorio / f"{periodo}.csv"
+        temporal = ruta.with_suffix(".csv.tmp")
+        facturacion.to_csv(temporal, index=False)
+        os.replace(temporal, ruta)
+        self._en_disco[periodo] = ruta
+
+    def _actualizar_acumulados(self, periodo, anteriores, nuevos):
+        # Resta lo que aportaba el periodo y suma lo nuevo; el resto de
+        # periodos no se vuelve a recorrer
+        acumulado = self._acumulado_medicos
+        if anteriores is not None:
+            acumulado = acumulado.sub(_aporte_medicos(anteriores), fill_value=0.0)
+            self._evolucion.pop(periodo, None)
+        if nuevos is not None:
+            acumulado = acumulado.add(_aporte_medicos(nuevos), fill_value=0.0)
+            self._evolucion[periodo] = _fila_evolucion(periodo, nuevos["resumen"])
+        # Médicos que ya no aparecen en ningún periodo
+        self._acumulado_medicos = acumulado[acumulado['Periodos'] > 0]
+        self._version += 1
+
+    def acumulados(self):
+        # Evolución por periodo y acumulado por médico en formato de tabla;
+        # solo se rehacen si algún periodo cambió desde la última consulta
+        if self._version_acumulados != self._version:
+            evolucion = pd.DataFrame([self._evolucion[p] for p in sorted(self._evolucion)])
+            acumulado_medicos = self._acumulado_medicos.sort_index()[COLUMNAS_ACUMULADO].reset_index()
+            self._acumulados = {'evolucion': evolucion, 'acumulado_medicos': acumulado_medicos}
+            self._version_acumulados = self._version
+        return self._acumulados
+
+
+def historial_sesion(session_state, nombre="historial_periodos", directorio=None):
+    # Sin `directorio` usa directorio_periodos(); la sesión nueva recupera los meses guardados
+    if nombre not in session_state:
+        session_state[nombre] = HistorialPeriodos(directorio if directorio is not None else directorio_periodos())
+    return session_state[nombre]
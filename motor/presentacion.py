@@ -0,0 +1,79 @@
+import numpy as np
+
+# -------------------- Presentación de tablas --------------------
+# Styler genera el HTML celda a celda en Python y en tablas grandes es lo que
+# más tarda. Por encima de UMBRAL_FILAS_STYLER las tablas se pintan con formatos
+# de columna declarativos (los aplica el navegador) y el color de la diferencia
+# sale de una máscara vectorizada en una columna indicadora. Los importes se
+# ven igual en las dos rutas (€1,234.57, el formato "euro" de Streamlit).
+
+UMBRAL_FILAS_STYLER = 200   # con 1.000 filas Styler ya tarda del orden de 1 s
+
+
+def _euros(valor):
+    # Mismo texto que el formato "euro" de las columnas: €1,234.57 y -€1,234.57
+    return f"-€{-valor:,.2f}" if valor < 0 else f"€{valor:,.2f}"
+
+
+# Tipo de columna -> (formato Styler, formato de columna, factor de escala)
+FORMATOS = {
+    "euros": (_euros, "euro", 1),
+    "porcentaje": ("{:.1f}%", "%.1f%%", 1),        # valores ya en 0-100
+    "fraccion": ("{:.1%}", "%.1f%%", 100),          # valores en 0-1
+    "diferencia": ("{:+.2%}", "%+.2f%%", 100),      # valores en 0-1, con signo
+}
+
+# Positivo, negativo y cero
+COLORES_SIGNO = np.array([
+    'color: #27ae60; font-weight: bold;', 'color: #e74c3c; font-weight: bold;', 'color: #7f8c8d;'
+])
+INDICADORES_SIGNO = np.array(["🟢", "🔴", "⚪"])
+
+
+def _signo(valores):
+    valores = np.asarray(valores, dtype=float)
+    return np.select([valores > 0, valores < 0], [0, 1], 2)
+
+
+def tabla_styler(df, formatos, colorear=()):
+    # Ruta para tablas pequeñas: mismo aspecto de siempre, colores por máscara
+    estilo = df.style.format({c: FORMATOS[t][0] for c, t in formatos.items() if c in df.columns})
+    for c in colorear:
+        estilo = estilo.apply(lambda col: COLORES_SIGNO[_signo(col)], subset=[c])
+    return estilo
+
+
+def tabla_columnas(df, formatos, colorear=()):
+    """Vista de `df` y `column_config` equivalentes a `tabla_styler`, sin Styler.
+
+    Las columnas con factor se escalan (p. ej. fracción -> %) y antes de cada
+    columna de `colorear` se inserta un indicador de signo.
+    """
+    import streamlit as st
+
+    escaladas = {c: df[c] * FORMATOS[t][2] for c, t in formatos.items() if c in df.columns and FORMATOS[t][2] != 1}
+    vista = df.assign(**escaladas) if escaladas else df
+    configuracion = {
+        c: st.column_config.NumberColumn(c, format=FORMATOS[t][1])
+        for c, t in formatos.items() if c in df.columns
+    }
+    for c in colorear:
+        if vista is df:
+            vista = df.copy(deep=False)
+        vista.insert(vista.columns.get_loc(c), f"± {c}", INDICADORES_SIGNO[_signo(df[c])])
+        configuracion[f"± {c}"] = st.column_config.TextColumn("±", width="small")
+    return vista, configuracion
+
+
+def mostrar_tabla(df, formatos, colorear=(), umbral=UMBRAL_FILAS_STYLER, **kwargs):
+    """Pinta `df` con st.dataframe; por encima de `umbral` filas sin Styler.
+
+    `formatos` es {columna: tipo de FORMATOS}; el resto de argumentos pasan a
+    st.dataframe.
+    """
+    import streamlit as st
+
+    if len(df) <= umbral:
+        return st.dataframe(tabla_styler(df, formatos, colorear), **kwargs)
+    vista, configuracion = tabla_columnas(df, formatos, colorear)
+    return st.dataframe(vista, column_config=configuracion, **kwargs)
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# -------------------- Reglas de abono por nivel --------------------
+
+
+def compilar_reglas(pct_abono):
+    # `pct_abono`: nivel -> (por debajo o igual al promedio, por encima).
+    # Tabla nivel × (debajo, encima). La última fila, de ceros, recoge los
+    # niveles desconocidos (código -1).
+    niveles = list(pct_abono.keys())
+    tabla = np.zeros((len(niveles) + 1, 2))
+    for i, nivel in enumerate(niveles):
+        tabla[i] = pct_abono[nivel]
+    return {"niveles": niveles, "tabla": tabla}
+
+
+def pct_nivel(reglas, nivel):
+    # (debajo, encima) de un nivel; (0, 0) si no tiene regla
+    codigo = reglas["niveles"].index(nivel) if nivel in reglas["niveles"] else -1
+    bajo, alto = reglas["tabla"][codigo]
+    return float(bajo), float(alto)
+
+
+def codigos_nivel(reglas, serie_nivel):
+    # Código entero de nivel por médico (-1 si el nivel no tiene regla)
+    return pd.Categorical(serie_nivel, categories=reglas["niveles"]).codes.astype(np.intp)
+
+
+def promedios_por_nivel(reglas, codigos, total_bruto, solo_positivos=False):
+    n_niveles = len(reglas["niveles"])
+    base = total_bruto > 0 if solo_positivos else np.ones(len(total_bruto), dtype=bool)
+    validos = base & (codigos >= 0)
+    conteos = np.bincount(codigos[validos], minlength=n_niveles)
+    # Suma exacta redondeada una sola vez (math.fsum): no depende del orden de
+    # las filas, así el motor incremental obtiene el mismo promedio
+    sumas = np.array([math.fsum(total_bruto[validos & (codigos == c)].tolist()) for c in range(n_niveles)])
+    promedios = np.where(conteos > 0, sumas / np.maximum(conteos, 1), 0.0)
+    return promedios, conteos
+
+
+class SumaExacta:
+    """Suma exacta de floats a la que se pueden sumar y restar valores en O(1).
+
+    Guarda sumandos cuya suma exacta es el total y lo redondea con math.fsum
+    al consultarlo: `valor()` coincide con `math.fsum` de los valores vivos.
+    """
+
+    MAX_SUMANDOS = 64
+
+    def __init__(self, valores=()):
+        self._sumandos = self._compactar(list(valores))
+
+    @staticmethod
+    def _compactar(sumandos):
+        # Pocos floats con la misma suma exacta: el total redondeado y los restos
+        compactos = []
+        while True:
+            total = math.fsum(sumandos)
+            if total == 0.0 or not math.isfinite(total):
+                return compactos + [total] if total else compactos
+            compactos.append(total)
+            sumandos.append(-total)
+
+    def sumar(self, valor):
+        self._sumandos.append(float(valor))
+        if len(self._sumandos) > self.MAX_SUMANDOS:
+            self._sumandos = self._compactar(self._sumandos)
+
+    def valor(self):
+        return math.fsum(self._sumandos)
+
+
+def evaluar_reglas(reglas, codigos, total_bruto, promedios, solo_positivos=False):
+    """Porcentaje de abono de todos los médicos de una vez.
+
+    Cada médico toma la fila de su nivel en la tabla y la columna según si su
+    bruto supera el promedio del nivel. Con `solo_positivos=True` quien no
+    facturó recibe 0.
+    """
+    promedio_medico = np.append(promedios, 0.0)[codigos]
+    encima = (total_bruto > promedio_medico).astype(np.intp)
+    pct = reglas["tabla"][codigos, encima]
+    if solo_positivos:
+        pct = np.where(total_bruto == 0, 0.0, pct)
+    return pct
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from motor.distribucion import matriz_facturacion, vectores_reparto
+
+# -------------------- Barrido de sensibilidad de los repartos --------------------
+# El porcentaje de abono de cada médico depende solo de su facturación bruta,
+# que no cambia al mover el reparto VITHAS/OSA de un servicio. Por eso los
+# totales son lineales en el vector de reparto OSA:
+#   total_osa      = T · osa        (T: facturación total por servicio)
+#   total_abonado  = W · osa        (W_j = Σ_i pct_i · facturación_ij)
+# y todas las combinaciones del barrido se evalúan con un único producto
+# matriz × vector.
+
+
+def barrer_repartos(df_calc, servicios, servicio_a, valores_a, servicio_b=None, valores_b=None):
+    """Totales para cada combinación de % OSA de uno o dos servicios.
+
+    `df_calc` es una distribución ya calculada (necesita Pct_Abono). Los
+    valores son fracciones OSA (0-1); VITHAS es el complemento. Devuelve un
+    DataFrame con una fila por combinación.
+    """
+    nombres, _, pct_osa = vectores_reparto(servicios)
+    matriz = matriz_facturacion(df_calc, nombres)
+    pct = df_calc["Pct_Abono"].to_numpy(dtype=float)
+
+    totales_servicio = matriz.sum(axis=0)            # T
+    pesos_abono = pct @ matriz                       # W
+
+    valores_a = np.asarray(valores_a, dtype=float)
+    if servicio_b is None:
+        rejilla = {servicio_a: valores_a}
+    else:
+        malla_a, malla_b = np.meshgrid(valores_a, np.asarray(valores_b, dtype=float), indexing="ij")
+        rejilla = {servicio_a: malla_a.ravel(), servicio_b: malla_b.ravel()}
+
+    # Una fila de reparto OSA por combinación (combinaciones × servicios)
+    combinaciones = np.tile(pct_osa, (len(next(iter(rejilla.values()))), 1))
+    for servicio, valores in rejilla.items():
+        combinaciones[:, nombres.index(servicio)] = valores
+
+    total_bruto = float(totales_servicio.sum())
+    total_osa = combinaciones @ totales_servicio
+    total_abonado = combinaciones @ pesos_abono
+
+    resultado = pd.DataFrame({f"% OSA {s}": v * 100 for s, v in rejilla.items()})
+    resultado["Total_VITHAS"] = total_bruto - total_osa
+    resultado["Total_OSA"] = total_osa
+    resultado["Total_Abonado"] = total_abonado
+    resultado["Saldo_OSA"] = total_osa - total_abonado
+    return resultado
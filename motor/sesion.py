@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# -------------------- Resultados compartidos entre páginas --------------------
+# La página de distribución publica la distribución calculada del periodo
+# (matriz de facturación incluida) una sola vez por sesión; las demás páginas
+# la leen sin copiarla. La matriz de facturación se guarda al publicar con sus
+# arrays en solo lectura: todas las lecturas comparten el mismo objeto y
+# modificarlo lanza ValueError en lugar de alterar lo que ven las demás páginas. El contador de versión sube solo cuando cambian los
+# datos: lo que cada página deriva de ellos (`derivado`) se guarda por versión
+# y solo se rehace cuando llega una distribución nueva.
+
+
+class AlmacenSesion:
+    """Última distribución publicada en la sesión, con contador de versión.
+
+    Los DataFrames que devuelve son los mismos objetos que se publicaron (no
+    copias): las páginas solo los leen, igual que los resultados de la caché.
+    `facturacion()` además no se puede modificar.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.clave = None
+        self.origen = None
+        self.servicios = None
+        self._resultados = None
+        self._facturacion = None
+        self._derivados = {}
+
+    def __bool__(self):
+        return self._resultados is not None
+
+    def publicar(self, clave, resultados, servicios, origen=None):
+        # Misma huella: no cambia nada y las páginas no recalculan
+        if clave == self.clave:
+            return self.version
+        self.clave = clave
+        self._resultados = resultados
+        self._facturacion = _solo_lectura(resultados["df_edit"], ["Médico", "Nivel"] + list(servicios))
+        self.servicios = servicios
+        self.origen = origen
+        self._derivados.clear()
+        self.version += 1
+        return self.version
+
+    def resultados(self):
+        # Mismo formato que calcular_resultados (df_edit, resumen, serv_df, nivel_df, indice)
+        return self._resultados
+
+    def facturacion(self):
+        # Matriz médico × servicio en formato del editor: siempre el mismo objeto, de solo lectura
+        return self._facturacion
+
+    def derivado(self, nombre, calcular):
+        # Datos derivados de la versión actual: se calculan una vez por versión
+        if nombre not in self._derivados:
+            self._derivados[nombre] = calcular()
+        return self._derivados[nombre]
+
+
+def _solo_lectura(df, columnas):
+    # Una copia por publicación; con copy=False cada columna queda en su propio
+    # array y pandas no los consolida ni los vuelve a copiar
+    arrays = {}
+    for c in columnas:
+        valores = np.array(df[c].to_numpy(), copy=True)
+        valores.flags.writeable = False
+        arrays[c] = valores
+    return pd.DataFrame(arrays, index=df.index, copy=False)
+
+
+def almacen_sesion(session_state, nombre="almacen_resultados"):
+    if nombre not in session_state:
+        session_state[nombre] = AlmacenSesion()
+    return session_state[nombre]
@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from motor.distribucion import matriz_facturacion, vectores_reparto
+from motor.reglas import codigos_nivel
+
+# -------------------- Simulación Monte Carlo del pool OSA --------------------
+# Se generan miles de escenarios de facturación alrededor de la actual (por
+# médico y servicio) y cada lote de escenarios pasa por las reglas de reparto
+# como operaciones sobre arrays (escenario × médico × servicio). Los lotes se
+# reparten entre procesos con semillas independientes.
+
+DISTRIBUCIONES = ("lognormal", "gamma", "normal")
+
+# Celdas (escenario × médico × servicio) por lote, para acotar la memoria
+CELDAS_POR_LOTE = 4_000_000
+
+
+def _muestrear(rng, base, distribucion, cv, escenarios):
+    # Escenarios con media `base` y coeficiente de variación `cv` (por servicio)
+    media = np.broadcast_to(base, (escenarios,) + base.shape)
+    cv = np.broadcast_to(np.asarray(cv, dtype=float), base.shape[-1:])
+    if distribucion == "lognormal":
+        sigma2 = np.log1p(cv ** 2)
+        factor = rng.lognormal(-sigma2 / 2, np.sqrt(sigma2), size=media.shape)
+        return media * factor
+    if distribucion == "gamma":
+        forma = 1 / np.maximum(cv, 1e-6) ** 2
+        factor = rng.gamma(forma, 1 / forma, size=media.shape)
+        return media * np.where(cv > 0, factor, 1.0)
+    if distribucion == "normal":
+        return np.maximum(media * (1 + cv * rng.standard_normal(media.shape)), 0.0)
+    raise ValueError(f"Distribución desconocida: {distribucion!r}")
+
+
+def _simular_lote(args):
+    (semilla, escenarios, base, distribucion, cv, pct_osa, codigos, tabla, n_niveles, solo_positivos) = args
+    rng = np.random.default_rng(semilla)
+    por_lote = max(1, CELDAS_POR_LOTE // max(1, base.size))
+
+    # Matriz nivel de cada médico (one-hot) para sumar por nivel con un producto
+    pertenece = np.zeros((len(codigos), n_niveles))
+    validos = codigos >= 0
+    pertenece[np.flatnonzero(validos), codigos[validos]] = 1.0
+
+    salidas = {"total_bruto": [], "total_osa": [], "total_abonado": [], "promedios": []}
+    for inicio in range(0, escenarios, por_lote):
+        e = min(por_lote, escenarios - inicio)
+        facturacion = _muestrear(rng, base, distribucion, cv, e)       # e × n × s
+        bruto = facturacion.sum(axis=2)                                # e × n
+        osa = facturacion @ pct_osa                                    # e × n
+
+        cuenta = (bruto > 0) if solo_positivos else np.ones_like(bruto, dtype=bool)
+        sumas = (bruto * cuenta) @ pertenece                           # e × niveles
+        conteos = cuenta.astype(float) @ pertenece
+        promedios = np.divide(sumas, conteos, out=np.zeros_like(sumas), where=conteos > 0)
+
+        promedio_medico = np.concatenate([promedios, np.zeros((e, 1))], axis=1)[:, codigos]
+        encima = (bruto > promedio_medico).astype(np.intp)
+        pct = tabla[codigos, encima]                                   # e × n
+        if solo_positivos:
+            pct = np.where(bruto == 0, 0.0, pct)
+
+        salidas["total_bruto"].append(bruto.sum(axis=1))
+        salidas["total_osa"].append(osa.sum(axis=1))
+        salidas["total_abonado"].append((osa * pct).sum(axis=1))
+        salidas["promedios"].append(promedios)
+    return {k: np.concatenate(v) for k, v in salidas.items()}
+
+
+def simular_pool_osa(df, servicios, reglas, escenarios=2000, distribucion="lognormal", cv=0.2,
+                     solo_positivos=False, procesos=None, semilla=None):
+    """Simula `escenarios` variaciones de la facturación de `df` y aplica las reglas de reparto.
+
+    `cv` es el coeficiente de variación (escalar o un valor por servicio).
+    Devuelve arrays por escenario: total_bruto, total_osa, total_abonado,
+    saldo_osa y promedios (escenario × nivel, en el orden de reglas["niveles"]).
+    """
+    if distribucion not in DISTRIBUCIONES:
+        raise ValueError(f"Distribución desconocida: {distribucion!r}")
+    nombres, _, pct_osa = vectores_reparto(servicios)
+    base = matriz_facturacion(df, nombres)
+    if isinstance(cv, dict):
+        cv = [cv.get(s, 0.0) for s in nombres]
+    codigos = codigos_nivel(reglas, df["Nivel"])
+    n_niveles = len(reglas["niveles"])
+
+    procesos = procesos or min(os.cpu_count() or 1, 8)
+    partes = [len(p) for p in np.array_split(np.arange(escenarios), procesos) if len(p)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(partes))
+    tareas = [
+        (s, e, base, distribucion, cv, pct_osa, codigos, reglas["tabla"], n_niveles, solo_positivos)
+        for s, e in zip(semillas, partes)
+    ]
+    if len(tareas) == 1:
+        lotes = [_simular_lote(tareas[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=len(tareas)) as pool:
+            lotes = list(pool.map(_simular_lote, tareas))
+
+    resultado = {k: np.concatenate([l[k] for l in lotes]) for k in lotes[0]}
+    resultado["saldo_osa"] = resultado["total_osa"] - resultado["total_abonado"]
+    resultado["niveles"] = list(reglas["niveles"])
+    return resultado
+
+
+def bandas_percentiles(resultado, percentiles=(5, 25, 50, 75, 95)):
+    # Tabla de percentiles por indicador (filas) para mostrar en la página
+    indicadores = {
+        "Saldo OSA": resultado["saldo_osa"],
+        "Total abonado": resultado["total_abonado"],
+        "Pool OSA": resultado["total_osa"],
+        "Facturación bruta": resultado["total_bruto"],
+    }
+    for i, nivel in enumerate(resultado["niveles"]):
+        indicadores[f"Promedio {nivel}"] = resultado["promedios"][:, i]
+    return pd.DataFrame(
+        {f"P{p}": [np.percentile(v, p) for v in indicadores.values()] for p in percentiles},
+        index=list(indicadores)
+    )
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from motor.config import configuracion
+
+# -------------------- Plantillas sintéticas --------------------
+# Plantillas de cualquier tamaño con el formato del editor, para medir cómo
+# escala la app. Los importes siguen una gamma por servicio (muchos médicos
+# con poco y pocos con mucho) y una fracción de médicos no factura en cada
+# servicio.
+
+
+def plantilla_sintetica(n_medicos, config=None, semilla=0, fraccion_ceros=0.2, importe_medio=2000.0):
+    """DataFrame Médico, Nivel y una columna por servicio con `n_medicos` filas.
+
+    Los niveles se reparten entre todos los niveles con regla de la
+    configuración y los importes se redondean al céntimo.
+    """
+    config = config or configuracion()
+    rng = np.random.default_rng(semilla)
+    niveles = np.array(config["reglas"]["niveles"], dtype=object)
+    ancho = len(str(max(n_medicos - 1, 0)))
+    df = pd.DataFrame({
+        "Médico": [f"Médico {i:0{ancho}d}" for i in range(n_medicos)],
+        "Nivel": niveles[rng.integers(0, len(niveles), n_medicos)],
+    })
+    for s in config["nombres_servicios"]:
+        importes = rng.gamma(2.0, importe_medio / 2.0, n_medicos)
+        importes[rng.random(n_medicos) < fraccion_ceros] = 0.0
+        df[s] = np.round(importes, 2)
+    return df
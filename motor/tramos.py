@@ -0,0 +1,43 @@
+import numpy as np
+
+# -------------------- Esquemas de abono por tramos (percentiles) --------------------
+# Generalización de la regla "encima/debajo del promedio": cada nivel se corta
+# en N+1 tramos por los percentiles de su propia distribución de facturación
+# bruta y cada tramo paga un porcentaje distinto del OSA disponible.
+
+
+def compilar_tramos(percentiles, pagos, niveles):
+    """Compila un esquema: `percentiles` crecientes (0-100) y `pagos[nivel]` con un % por tramo."""
+    percentiles = np.asarray(percentiles, dtype=float)
+    tabla = np.zeros((len(niveles) + 1, len(percentiles) + 1))
+    for i, nivel in enumerate(niveles):
+        tabla[i] = pagos[nivel]
+    return {"percentiles": percentiles, "niveles": list(niveles), "pagos": tabla}
+
+
+def umbrales_por_nivel(tramos, codigos, total_bruto, solo_positivos=False):
+    # Percentiles de cada nivel calculados una sola vez (fila = nivel)
+    base = total_bruto > 0 if solo_positivos else np.ones(len(total_bruto), dtype=bool)
+    umbrales = np.zeros((len(tramos["niveles"]), len(tramos["percentiles"])))
+    for c in range(len(tramos["niveles"])):
+        valores = total_bruto[(codigos == c) & base]
+        if len(valores):
+            umbrales[c] = np.percentile(valores, tramos["percentiles"])
+    return umbrales
+
+
+def evaluar_tramos(tramos, codigos, total_bruto, umbrales, solo_positivos=False):
+    """Tramo y porcentaje de abono de todos los médicos.
+
+    Cada médico cae en el tramo dado por cuántos umbrales de su nivel supera
+    (búsqueda en umbrales ordenados). Los médicos sin nivel con esquema
+    quedan en el tramo 0 con pago 0.
+    """
+    tramo = np.zeros(len(total_bruto), dtype=np.intp)
+    for c in range(len(tramos["niveles"])):
+        mascara = codigos == c
+        tramo[mascara] = np.searchsorted(umbrales[c], total_bruto[mascara], side="left")
+    pct = tramos["pagos"][codigos, tramo]
+    if solo_positivos:
+        pct = np.where(total_bruto == 0, 0.0, pct)
+    return tramo, pct
@@ -1,10 +1,20 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import math
+import numpy as np
+
+from motor import (
+    ErrorConfiguracion, MAX_FIGURAS, TOP_MEDICOS, UMBRAL_MEDICOS_GRAFICO, almacen_sesion, cache_sesion,
+    calcular_resultados, configuracion, figura_cacheada, histograma, mostrar_tabla, panel_perfil, pct_nivel,
+    perfil_sesion, plantilla_facturacion, resultados_incrementales, resumen_cajas, top_con_otros
+)
 
 st.set_page_config(page_title="Escalabilidad", layout="wide", page_icon="📊")
 
+# Tiempos por sección de cada ejecución (panel "Perfil de ejecución" en la barra lateral)
+perfil = perfil_sesion(st.session_state, "escalabilidad")
+perfil.seccion("Configuración")
+
 # Header con diseño mejorado
 st.markdown("""
 <div style="background: linear-gradient(135deg, #023004, #023004, #388e3c); 
@@ -20,87 +30,63 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # -------------------- Definición de niveles y servicios --------------------
-niveles = {
-    "Especialista": ["ME1", "ME2", "ME3", "ME4", "ME5", "ME6"],
-    "Consultor": ["MC1", "MC2", "MC3", "MC4", "MC5", "MC6"]
-}
-
-servicios = {
-    "Consultas": {"VITHAS": 0.30, "OSA": 0.70},
-    "Cirugías": {"VITHAS": 0.10, "OSA": 0.90},
-    "Urgencias": {"VITHAS": 0.50, "OSA": 0.50},
-    "Ecografías": {"VITHAS": 0.60, "OSA": 0.40},
-    "MQX": {"VITHAS": 0.00, "OSA": 1.00},
-    "Pacientes INTL": {"VITHAS": 0.40, "OSA": 0.60},
-    "Rehabilitación": {"VITHAS": 0.40, "OSA": 0.60},
-    "Podología": {"VITHAS": 0.30, "OSA": 0.70}
-}
-
-# -------------------- Crear DataFrame base --------------------
-medicos = []
-for nivel, lista in niveles.items():
-    medicos.extend([(m, nivel) for m in lista])
+# Compartidas por todas las páginas: config/distribucion.json
+try:
+    config = configuracion()
+except ErrorConfiguracion as e:
+    st.error(f"❌ {e}")
+    st.stop()
 
-cols = ["Médico", "Nivel"] + list(servicios.keys())
-rows = []
-for medico, nivel in medicos:
-    fila = {"Médico": medico, "Nivel": nivel}
-    for s in servicios.keys():
-        fila[s] = 0.0
-    rows.append(fila)
+niveles = config["niveles"]
+servicios = config["servicios"]
 
-df_edit = pd.DataFrame(rows, columns=cols)
+# -------------------- Crear DataFrame base --------------------
+# Parte de la facturación publicada por 'Distribución VITHAS-OSA' si la hay; el
+# editor se reinicia (clave nueva) solo cuando llega una versión nueva
+almacen = almacen_sesion(st.session_state)
+desde_almacen = bool(almacen) and list(almacen.servicios) == list(servicios)
+if desde_almacen:
+    df_edit = almacen.facturacion()
+else:
+    df_edit = plantilla_facturacion(config)
 
 # -------------------- Entrada de montos interactiva --------------------
+perfil.seccion("Entrada")
 st.markdown("### 📋 Ingreso de Montos de Facturación")
-df_edit = st.data_editor(df_edit, num_rows="fixed", use_container_width=True, height=400)
-
-for s in servicios.keys():
-    df_edit[s] = pd.to_numeric(df_edit[s], errors='coerce').fillna(0.0)
+if desde_almacen:
+    st.caption(f"Facturación del periodo {almacen.origen}; los cambios aquí no modifican la página de distribución.")
+df_edit = st.data_editor(df_edit, num_rows="fixed", use_container_width=True, height=400,
+                         key=f"editor_escalabilidad_{almacen.version}")
 
 # -------------------- Cálculos --------------------
-df_edit["Total_Bruto"] = df_edit[list(servicios.keys())].sum(axis=1)
-df_edit["Total_OSA_Disponible"] = df_edit.apply(lambda row: sum(row[s]*servicios[s]["OSA"] for s in servicios), axis=1)
-df_edit["Total_VITHAS"] = df_edit.apply(lambda row: sum(row[s]*servicios[s]["VITHAS"] for s in servicios), axis=1)
-
-# -------------------- CALCULAR PROMEDIOS SOLO CON MÉDICOS QUE FACTURARON DIFERENTE DE CERO --------------------
-# Filtrar médicos con facturación mayor a cero
-df_facturacion_positiva = df_edit[df_edit["Total_Bruto"] > 0]
-
-# Calcular promedios solo con médicos que facturaron
-if not df_facturacion_positiva.empty:
-    promedios_nivel = df_facturacion_positiva.groupby("Nivel")["Total_Bruto"].mean().to_dict()
+perfil.seccion("Cálculos")
+# Reglas de abono evaluadas para todos los médicos de una vez; los promedios por
+# nivel solo consideran médicos que facturaron diferente de cero (regla propia
+# de esta página, distinta de la distribución publicada). Sin cambios en el
+# editor se calcula una vez por versión publicada y se guarda en el almacén;
+# con cambios, entre reejecuciones solo se actualizan las filas editadas.
+if desde_almacen and df_edit.equals(almacen.facturacion()):
+    resultados = almacen.derivado(
+        "escalabilidad_resultados", lambda: calcular_resultados(almacen.facturacion(), servicios, solo_positivos=True)
+    )
 else:
-    promedios_nivel = {"Especialista": 0, "Consultor": 0}
-
-def calcular_abono(row):
-    nivel = row["Nivel"]
-    total_bruto = row["Total_Bruto"]
-    total_osa = row["Total_OSA_Disponible"]
-    
-    # Si no facturó nada, abono es cero
-    if total_bruto == 0:
-        return 0.0
-    
-    if nivel == "Especialista":
-        pct = 0.90 if total_bruto > promedios_nivel.get(nivel, 0) else 0.85
-    elif nivel == "Consultor":
-        pct = 0.92 if total_bruto > promedios_nivel.get(nivel, 0) else 0.88
-    else:
-        pct = 0.0
-    return total_osa * pct
-
-df_edit["Abonado_a_Medico"] = df_edit.apply(calcular_abono, axis=1)
+    resultados = resultados_incrementales(st.session_state, "incremental_escalabilidad", df_edit, servicios,
+                                          solo_positivos=True)
+df_edit = resultados["df_edit"]
+indice = resultados["indice"]
+resumen = resultados["resumen"]
+promedios_nivel = resumen["promedios_nivel"]
 
 # -------------------- KPI tipo tarjeta promedios por nivel --------------------
+perfil.seccion("Promedios")
 st.markdown("### 📈 Promedio de facturación por nivel jerárquico")
 st.caption("⚠️ Calculado solo con médicos que facturaron montos diferentes de cero")
 
 c1, c2 = st.columns(2)
 
-# Mostrar también la cantidad de médicos considerados en el promedio
-especialistas_con_facturacion = len(df_facturacion_positiva[df_facturacion_positiva["Nivel"] == "Especialista"])
-consultores_con_facturacion = len(df_facturacion_positiva[df_facturacion_positiva["Nivel"] == "Consultor"])
+# Mostrar también la cantidad de médicos considerados en el promedio (los que facturaron más de cero)
+especialistas_con_facturacion = int((indice.nivel("Especialista")["Total_Bruto"] > 0).sum())
+consultores_con_facturacion = int((indice.nivel("Consultor")["Total_Bruto"] > 0).sum())
 
 c1.markdown(f"""
 <div style="background: linear-gradient(135deg, #3498db, #2980b9); padding: 20px; border-radius: 15px; text-align: center; color: white;">
@@ -118,281 +104,439 @@ c2.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
+# Figuras guardadas por huella de sus datos (compartidas con las demás páginas)
+cache_figuras = cache_sesion(st.session_state, "cache_figuras", max_entradas=MAX_FIGURAS)
+
 # -------------------- Selección de médico --------------------
-st.markdown("### 👨‍⚕️ Reporte Interactivo del Médico")
-medico_sel = st.selectbox("Seleccione un médico", df_edit["Médico"].unique())
-row = df_edit[df_edit["Médico"]==medico_sel].iloc[0]
-
-# -------------------- Mensaje personalizado sobre el promedio --------------------
-nivel_medico = row["Nivel"]
-promedio_nivel = promedios_nivel.get(nivel_medico, 0)
-
-# Usamos markdown en lugar de st.success/st.warning para evitar problemas con DeltaGenerator
-if row["Total_Bruto"] > promedio_nivel:
-    mensaje_html = f"""
-    <div style="background-color: #d4edda; color: #155724; padding: 12px; border-radius: 5px; border-left: 4px solid #28a745; margin: 10px 0;">
-        <strong>¡EXCELENTE RENDIMIENTO!</strong> Doctor {medico_sel}, usted está por <strong>ENCIMA</strong> del promedio de facturación de su grupo.
-    </div>
-    """
-else:
-    mensaje_html = f"""
-    <div style="background-color: #fff3cd; color: #856404; padding: 12px; border-radius: 5px; border-left: 4px solid #ffc107; margin: 10px 0;">
-        <strong>ATENCIÓN:</strong> Doctor {medico_sel}, usted está por <strong>DEBAJO</strong> del promedio de facturación de su grupo.
+# El reporte del médico y el gráfico por nivel son fragmentos: cambiar el médico
+# o el nivel seleccionado solo reejecuta su sección, con los resultados ya
+# calculados arriba (indice, promedios_nivel).
+@st.fragment
+@perfil.fragmento
+def reporte_medico():
+    perfil.seccion("Médico")
+    st.markdown("### 👨‍⚕️ Reporte Interactivo del Médico")
+    medico_sel = st.selectbox("Seleccione un médico", indice.medicos())
+    row = indice.fila(medico_sel)
+
+    # -------------------- Mensaje personalizado sobre el promedio --------------------
+    nivel_medico = row["Nivel"]
+    promedio_nivel = promedios_nivel.get(nivel_medico, 0)
+
+    # Usamos markdown en lugar de st.success/st.warning para evitar problemas con DeltaGenerator
+    if row["Total_Bruto"] > promedio_nivel:
+        mensaje_html = f"""
+        <div style="background-color: #d4edda; color: #155724; padding: 12px; border-radius: 5px; border-left: 4px solid #28a745; margin: 10px 0;">
+            <strong>¡EXCELENTE RENDIMIENTO!</strong> Doctor {medico_sel}, usted está por <strong>ENCIMA</strong> del promedio de facturación de su grupo.
+        </div>
+        """
+    else:
+        mensaje_html = f"""
+        <div style="background-color: #fff3cd; color: #856404; padding: 12px; border-radius: 5px; border-left: 4px solid #ffc107; margin: 10px 0;">
+            <strong>ATENCIÓN:</strong> Doctor {medico_sel}, usted está por <strong>DEBAJO</strong> del promedio de facturación de su grupo.
+        </div>
+        """
+
+    st.markdown(mensaje_html, unsafe_allow_html=True)
+
+    # -------------------- Cálculos para el potencial de ganancia --------------------
+    # Determinar porcentajes actuales y potenciales (reglas de abono de la configuración)
+    pct_debajo, pct_encima = pct_nivel(config["reglas"], nivel_medico)
+    pct_actual = pct_debajo if row["Total_Bruto"] <= promedio_nivel else pct_encima
+    pct_potencial = pct_encima
+
+    abono_actual = row["Total_OSA_Disponible"] * pct_actual
+    abono_potencial = row["Total_OSA_Disponible"] * pct_potencial
+    diferencia_abono = abono_potencial - abono_actual
+    porcentaje_actual = (abono_actual / row["Total_Bruto"] * 100) if row["Total_Bruto"] > 0 else 0
+    porcentaje_potencial = (abono_potencial / row["Total_Bruto"] * 100) if row["Total_Bruto"] > 0 else 0
+
+    osa_final_actual = row["Total_OSA_Disponible"] - abono_actual
+    osa_final_potencial = row["Total_OSA_Disponible"] - abono_potencial
+
+    # -------------------- Nuevo diseño de KPIs para el médico --------------------
+    # Título con nombre del médico
+    st.markdown(f"### 📝 Reporte de Rendimiento del Médico - <span style='font-size:1.3em; color:#2e7d32;'>Dr. {medico_sel}</span>", unsafe_allow_html=True)
+
+    # Primera fila de KPIs principales
+    kpi_cols1 = st.columns(4)
+
+    kpi_cols1[0].markdown(f"""
+    <div style="background: linear-gradient(135deg, #1b5e20, #2e7d32); padding: 15px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+        <h4 style="margin: 0; font-size: 1rem;">Facturación Total</h4>
+        <h2 style="margin: 5px 0; font-size: 1.8rem;">{row['Total_Bruto']:,.2f} €</h2>
     </div>
-    """
-
-st.markdown(mensaje_html, unsafe_allow_html=True)
-
-# -------------------- Cálculos para el potencial de ganancia --------------------
-# Determinar porcentajes actuales y potenciales
-if nivel_medico == "Especialista":
-    pct_actual = 0.85 if row["Total_Bruto"] <= promedio_nivel else 0.90
-    pct_potencial = 0.90
-else:  # Consultor
-    pct_actual = 0.88 if row["Total_Bruto"] <= promedio_nivel else 0.92
-    pct_potencial = 0.92
-
-abono_actual = row["Total_OSA_Disponible"] * pct_actual
-abono_potencial = row["Total_OSA_Disponible"] * pct_potencial
-diferencia_abono = abono_potencial - abono_actual
-porcentaje_actual = (abono_actual / row["Total_Bruto"] * 100) if row["Total_Bruto"] > 0 else 0
-porcentaje_potencial = (abono_potencial / row["Total_Bruto"] * 100) if row["Total_Bruto"] > 0 else 0
-
-osa_final_actual = row["Total_OSA_Disponible"] - abono_actual
-osa_final_potencial = row["Total_OSA_Disponible"] - abono_potencial
-
-# -------------------- Nuevo diseño de KPIs para el médico --------------------
-# Título con nombre del médico
-st.markdown(f"### 📝 Reporte de Rendimiento del Médico - <span style='font-size:1.3em; color:#2e7d32;'>Dr. {medico_sel}</span>", unsafe_allow_html=True)
-
-# Primera fila de KPIs principales
-kpi_cols1 = st.columns(4)
-
-kpi_cols1[0].markdown(f"""
-<div style="background: linear-gradient(135deg, #1b5e20, #2e7d32); padding: 15px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-    <h4 style="margin: 0; font-size: 1rem;">Facturación Total</h4>
-    <h2 style="margin: 5px 0; font-size: 1.8rem;">{row['Total_Bruto']:,.2f} €</h2>
-</div>
-""", unsafe_allow_html=True)
-
-kpi_cols1[1].markdown(f"""
-<div style="background: linear-gradient(135deg, #00695c, #00897b); padding: 15px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-    <h4 style="margin: 0; font-size: 1rem;">Parte VITHAS</h4>
-    <h2 style="margin: 5px 0; font-size: 1.8rem;">{row['Total_VITHAS']:,.2f} €</h2>
-</div>
-""", unsafe_allow_html=True)
-
-kpi_cols1[2].markdown(f"""
-<div style="background: linear-gradient(135deg, #2e7d32, #43a047); padding: 15px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-    <h4 style="margin: 0; font-size: 1rem;">Abonado al Médico</h4>
-    <h2 style="margin: 5px 0; font-size: 1.8rem;">{abono_actual:,.2f} €</h2>
-    <p style="margin: 0; font-size: 0.9rem;">({porcentaje_actual:.1f}% de la facturación)</p>
-</div>
-""", unsafe_allow_html=True)
-
-kpi_cols1[3].markdown(f"""
-<div style="background: linear-gradient(135deg, #558b2f, #689f38); padding: 15px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-    <h4 style="margin: 0; font-size: 1rem;">OSA Final</h4>
-    <h2 style="margin: 5px 0; font-size: 1.8rem;">{osa_final_actual:,.2f} €</h2>
-</div>
-""", unsafe_allow_html=True)
-
-# -------------------- POTENCIAL DE INGRESOS --------------------
-st.markdown("---")
-st.subheader("📈 Potencial de Ingresos")
-
-kpi_cols2 = st.columns(2)
+    """, unsafe_allow_html=True)
 
-if diferencia_abono > 0:
-    kpi_cols2[0].markdown(f"""
-    <div style="background: linear-gradient(135deg, #e65100, #ef6c00); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-        <h4 style="margin: 0; font-size: 1.1rem;">Potencial no alcanzado</h4>
-        <h2 style="margin: 10px 0; font-size: 2rem;">{diferencia_abono:,.2f} €</h2>
-        <p style="margin: 0; font-size: 1rem;">Por no superar el promedio de su nivel</p>
+    kpi_cols1[1].markdown(f"""
+    <div style="background: linear-gradient(135deg, #00695c, #00897b); padding: 15px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+        <h4 style="margin: 0; font-size: 1rem;">Parte VITHAS</h4>
+        <h2 style="margin: 5px 0; font-size: 1.8rem;">{row['Total_VITHAS']:,.2f} €</h2>
     </div>
     """, unsafe_allow_html=True)
-else:
-    kpi_cols2[0].markdown(f"""
-    <div style="background: linear-gradient(135deg, #2e7d32, #43a047); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-        <h4 style="margin: 0; font-size: 1.1rem;">¡Meta alcanzada!</h4>
-        <h2 style="margin: 10px 0; font-size: 2rem;">{abono_potencial:,.2f} €</h2>
-        <p style="margin: 0; font-size: 1rem;">Ha superado el promedio de su nivel</p>
+
+    kpi_cols1[2].markdown(f"""
+    <div style="background: linear-gradient(135deg, #2e7d32, #43a047); padding: 15px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+        <h4 style="margin: 0; font-size: 1rem;">Abonado al Médico</h4>
+        <h2 style="margin: 5px 0; font-size: 1.8rem;">{abono_actual:,.2f} €</h2>
+        <p style="margin: 0; font-size: 0.9rem;">({porcentaje_actual:.1f}% de la facturación)</p>
     </div>
     """, unsafe_allow_html=True)
 
-kpi_cols2[1].markdown(f"""
-<div style="background: linear-gradient(135deg, #1565c0, #1976d2); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-    <h4 style="margin: 0; font-size: 1.1rem;">Abono potencial máximo</h4>
-    <h2 style="margin: 10px 0; font-size: 2rem;">{abono_potencial:,.2f} €</h2>
-    <p style="margin: 0; font-size: 1rem;">({porcentaje_potencial:.1f}% de la facturación)</p>
-</div>
-""", unsafe_allow_html=True)
+    kpi_cols1[3].markdown(f"""
+    <div style="background: linear-gradient(135deg, #558b2f, #689f38); padding: 15px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+        <h4 style="margin: 0; font-size: 1rem;">OSA Final</h4>
+        <h2 style="margin: 5px 0; font-size: 1.8rem;">{osa_final_actual:,.2f} €</h2>
+    </div>
+    """, unsafe_allow_html=True)
 
-# -------------------- POTENCIAL DE ESCALABILIDAD --------------------
-st.markdown("---")
-st.subheader("🚀 Potencial de Escalabilidad")
+    # -------------------- POTENCIAL DE INGRESOS --------------------
+    st.markdown("---")
+    st.subheader("📈 Potencial de Ingresos")
 
-kpi_cols3 = st.columns(2)
+    kpi_cols2 = st.columns(2)
 
-if diferencia_abono > 0:
-    # Caso: No superó el promedio
-    kpi_cols3[0].markdown(f"""
-    <div style="background: linear-gradient(135deg, #d32f2f, #f44336); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-        <h4 style="margin: 0; font-size: 1.1rem;">Pérdida Estimada</h4>
-        <h2 style="margin: 10px 0; font-size: 2rem;">{diferencia_abono:,.2f} €</h2>
-        <p style="margin: 0; font-size: 1rem;">Por no alcanzar tu potencial máximo</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    kpi_cols3[1].markdown(f"""
-    <div style="background-color: #ffebee; color: #c62828; padding: 20px; border-radius: 10px; border-left: 4px solid #f44336;">
-        <h4 style="margin: 0 0 15px 0; font-size: 1.1rem;">⚠️ Oportunidad de mejora</h4>
-        <p style="margin: 0; font-size: 1rem;">
-            <strong>Esta es la cantidad que estás dejando de percibir por no alcanzar el promedio de tu nivel.</strong> 
-            Superar el promedio es el primer paso para convertirte en socio de OSA y acceder a mayores beneficios.
-            Recuerda que depende solo de ti, OSA te abona tu esfuerzo!!.
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-else:
-    # Caso: Superó el promedio
-    kpi_cols3[0].markdown(f"""
-    <div style="background: linear-gradient(135deg, #2e7d32, #43a047); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-        <h4 style="margin: 0; font-size: 1.1rem;">Potencial Alcanzado</h4>
+    if diferencia_abono > 0:
+        kpi_cols2[0].markdown(f"""
+        <div style="background: linear-gradient(135deg, #e65100, #ef6c00); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+            <h4 style="margin: 0; font-size: 1.1rem;">Potencial no alcanzado</h4>
+            <h2 style="margin: 10px 0; font-size: 2rem;">{diferencia_abono:,.2f} €</h2>
+            <p style="margin: 0; font-size: 1rem;">Por no superar el promedio de su nivel</p>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        kpi_cols2[0].markdown(f"""
+        <div style="background: linear-gradient(135deg, #2e7d32, #43a047); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+            <h4 style="margin: 0; font-size: 1.1rem;">¡Meta alcanzada!</h4>
+            <h2 style="margin: 10px 0; font-size: 2rem;">{abono_potencial:,.2f} €</h2>
+            <p style="margin: 0; font-size: 1rem;">Ha superado el promedio de su nivel</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    kpi_cols2[1].markdown(f"""
+    <div style="background: linear-gradient(135deg, #1565c0, #1976d2); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+        <h4 style="margin: 0; font-size: 1.1rem;">Abono potencial máximo</h4>
         <h2 style="margin: 10px 0; font-size: 2rem;">{abono_potencial:,.2f} €</h2>
-        <p style="margin: 0; font-size: 1rem;">Máximo rendimiento obtenido</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    kpi_cols3[1].markdown(f"""
-    <div style="background-color: #e8f5e9; color: #2e7d32; padding: 20px; border-radius: 10px; border-left: 4px solid #4caf50;">
-        <h4 style="margin: 0 0 15px 0; font-size: 1.1rem;">🎯 Excelente rendimiento</h4>
-        <p style="margin: 0; font-size: 1rem;">
-            <strong>Este es el camino para convertirte en socio de OSA.</strong> 
-            Mantén este nivel de desempeño para acceder a beneficios exclusivos y mayores porcentajes de retribución.
-        </p>
+        <p style="margin: 0; font-size: 1rem;">({porcentaje_potencial:.1f}% de la facturación)</p>
     </div>
     """, unsafe_allow_html=True)
 
-# Gráfico de comparación
-st.markdown("#### 📊 Comparativa de Potencial")
-comparativa_data = {
-    'Escenario': ['Actual', 'Potencial'],
-    'Ingresos (€)': [abono_actual, abono_potencial]
-}
-df_comparativa = pd.DataFrame(comparativa_data)
-
-fig_comparativa = px.bar(df_comparativa, x='Escenario', y='Ingresos (€)', 
-                         color='Escenario',
-                         color_discrete_map={'Actual': '#43a047', 'Potencial': '#1976d2'},
-                         text_auto='.2s',
-                         title=f"Comparativa de Potencial - Dr. {medico_sel}")
-
-fig_comparativa.update_traces(texttemplate='%{y:,.0f} €', textposition='inside')
-fig_comparativa.update_layout(showlegend=False)
-st.plotly_chart(fig_comparativa, use_container_width=True)
-
-# -------------------- DESGLOSE POR SERVICIO --------------------
-st.markdown("---")
-st.subheader("🧮 Desglose por Servicio")
-
-# Calcular abono por servicio
-servicios_con_facturacion = {}
-for servicio in servicios.keys():
-    if row[servicio] > 0:
-        facturado = row[servicio]
-        osa_disponible = facturado * servicios[servicio]["OSA"]
-        abono_servicio = osa_disponible * (pct_potencial if row["Total_Bruto"] > promedio_nivel else pct_actual)
-        servicios_con_facturacion[servicio] = {
-            'facturado': facturado,
-            'abonado': abono_servicio,
-            'porcentaje_abono': (abono_servicio / facturado * 100) if facturado > 0 else 0
-        }
-
-# Mostrar KPIs por servicio
-if servicios_con_facturacion:
-    num_cols = 3  # 3 columnas para mejor visualización
-    num_filas = math.ceil(len(servicios_con_facturacion) / num_cols)
-    
-    colores_servicios = ["#2e7d32", "#388e3c", "#43a047", "#4caf50", "#66bb6a", "#81c784", "#a5d6a7", "#c8e6c9"]
-    
-    for i in range(num_filas):
-        cols_servicio = st.columns(num_cols)
-        for j in range(num_cols):
-            idx = i * num_cols + j
-            if idx < len(servicios_con_facturacion):
-                servicio = list(servicios_con_facturacion.keys())[idx]
-                datos = servicios_con_facturacion[servicio]
-                color_idx = idx % len(colores_servicios)
-                
-                cols_servicio[j].markdown(f"""
-                <div style="background-color: {colores_servicios[color_idx]}; border-radius: 10px; padding: 15px; color: white; text-align: center; margin-bottom: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-                    <h5 style="margin: 0 0 10px 0; font-size: 1rem; font-weight: bold;">{servicio}</h5>
-                    <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
-                        <span style="font-size: 0.85rem;">Facturado:</span>
-                        <span style="font-size: 0.85rem; font-weight: bold;">{datos['facturado']:,.2f} €</span>
-                    </div>
-                    <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
-                        <span style="font-size: 0.85rem;">Abonado:</span>
-                        <span style="font-size: 0.85rem; font-weight: bold;">{datos['abonado']:,.2f} €</span>
-                    </div>
-                    <div style="display: flex; justify-content: space-between;">
-                        <span style="font-size: 0.85rem;">% Abono:</span>
-                        <span style="font-size: 0.85rem; font-weight: bold;">{datos['porcentaje_abono']:.1f}%</span>
+    # -------------------- POTENCIAL DE ESCALABILIDAD --------------------
+    perfil.seccion("Potencial (gráfico)")
+    # Plotly se importa al llegar a los gráficos (las tarjetas del médico ya se han pintado)
+    import plotly.express as px
+
+    st.markdown("---")
+    st.subheader("🚀 Potencial de Escalabilidad")
+
+    kpi_cols3 = st.columns(2)
+
+    if diferencia_abono > 0:
+        # Caso: No superó el promedio
+        kpi_cols3[0].markdown(f"""
+        <div style="background: linear-gradient(135deg, #d32f2f, #f44336); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+            <h4 style="margin: 0; font-size: 1.1rem;">Pérdida Estimada</h4>
+            <h2 style="margin: 10px 0; font-size: 2rem;">{diferencia_abono:,.2f} €</h2>
+            <p style="margin: 0; font-size: 1rem;">Por no alcanzar tu potencial máximo</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        kpi_cols3[1].markdown(f"""
+        <div style="background-color: #ffebee; color: #c62828; padding: 20px; border-radius: 10px; border-left: 4px solid #f44336;">
+            <h4 style="margin: 0 0 15px 0; font-size: 1.1rem;">⚠️ Oportunidad de mejora</h4>
+            <p style="margin: 0; font-size: 1rem;">
+                <strong>Esta es la cantidad que estás dejando de percibir por no alcanzar el promedio de tu nivel.</strong> 
+                Superar el promedio es el primer paso para convertirte en socio de OSA y acceder a mayores beneficios.
+                Recuerda que depende solo de ti, OSA te abona tu esfuerzo!!.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    else:
+        # Caso: Superó el promedio
+        kpi_cols3[0].markdown(f"""
+        <div style="background: linear-gradient(135deg, #2e7d32, #43a047); padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+            <h4 style="margin: 0; font-size: 1.1rem;">Potencial Alcanzado</h4>
+            <h2 style="margin: 10px 0; font-size: 2rem;">{abono_potencial:,.2f} €</h2>
+            <p style="margin: 0; font-size: 1rem;">Máximo rendimiento obtenido</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        kpi_cols3[1].markdown(f"""
+        <div style="background-color: #e8f5e9; color: #2e7d32; padding: 20px; border-radius: 10px; border-left: 4px solid #4caf50;">
+            <h4 style="margin: 0 0 15px 0; font-size: 1.1rem;">🎯 Excelente rendimiento</h4>
+            <p style="margin: 0; font-size: 1rem;">
+                <strong>Este es el camino para convertirte en socio de OSA.</strong> 
+                Mantén este nivel de desempeño para acceder a beneficios exclusivos y mayores porcentajes de retribución.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    # Gráfico de comparación
+    st.markdown("#### 📊 Comparativa de Potencial")
+    comparativa_data = {
+        'Escenario': ['Actual', 'Potencial'],
+        'Ingresos (€)': [abono_actual, abono_potencial]
+    }
+    df_comparativa = pd.DataFrame(comparativa_data)
+
+    def figura_comparativa(df):
+        figura = px.bar(df, x='Escenario', y='Ingresos (€)',
+                        color='Escenario',
+                        color_discrete_map={'Actual': '#43a047', 'Potencial': '#1976d2'},
+                        text_auto='.2s',
+                        title=f"Comparativa de Potencial - Dr. {medico_sel}")
+        figura.update_traces(texttemplate='%{y:,.0f} €', textposition='inside')
+        figura.update_layout(showlegend=False)
+        return figura
+
+    fig_comparativa = figura_cacheada(cache_figuras, 'comparativa_potencial', df_comparativa, figura_comparativa,
+                                      medico_sel)
+    st.plotly_chart(fig_comparativa, use_container_width=True)
+
+    # -------------------- DESGLOSE POR SERVICIO --------------------
+    perfil.seccion("Desglose por servicio")
+    st.markdown("---")
+    st.subheader("🧮 Desglose por Servicio")
+
+    # Calcular abono por servicio
+    servicios_con_facturacion = {}
+    for servicio in servicios.keys():
+        if row[servicio] > 0:
+            facturado = row[servicio]
+            osa_disponible = facturado * servicios[servicio]["OSA"]
+            abono_servicio = osa_disponible * (pct_potencial if row["Total_Bruto"] > promedio_nivel else pct_actual)
+            servicios_con_facturacion[servicio] = {
+                'facturado': facturado,
+                'abonado': abono_servicio,
+                'porcentaje_abono': (abono_servicio / facturado * 100) if facturado > 0 else 0
+            }
+
+    # Mostrar KPIs por servicio
+    if servicios_con_facturacion:
+        num_cols = 3  # 3 columnas para mejor visualización
+        num_filas = math.ceil(len(servicios_con_facturacion) / num_cols)
+
+        colores_servicios = ["#2e7d32", "#388e3c", "#43a047", "#4caf50", "#66bb6a", "#81c784", "#a5d6a7", "#c8e6c9"]
+
+        for i in range(num_filas):
+            cols_servicio = st.columns(num_cols)
+            for j in range(num_cols):
+                idx = i * num_cols + j
+                if idx < len(servicios_con_facturacion):
+                    servicio = list(servicios_con_facturacion.keys())[idx]
+                    datos = servicios_con_facturacion[servicio]
+                    color_idx = idx % len(colores_servicios)
+
+                    cols_servicio[j].markdown(f"""
+                    <div style="background-color: {colores_servicios[color_idx]}; border-radius: 10px; padding: 15px; color: white; text-align: center; margin-bottom: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                        <h5 style="margin: 0 0 10px 0; font-size: 1rem; font-weight: bold;">{servicio}</h5>
+                        <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
+                            <span style="font-size: 0.85rem;">Facturado:</span>
+                            <span style="font-size: 0.85rem; font-weight: bold;">{datos['facturado']:,.2f} €</span>
+                        </div>
+                        <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
+                            <span style="font-size: 0.85rem;">Abonado:</span>
+                            <span style="font-size: 0.85rem; font-weight: bold;">{datos['abonado']:,.2f} €</span>
+                        </div>
+                        <div style="display: flex; justify-content: space-between;">
+                            <span style="font-size: 0.85rem;">% Abono:</span>
+                            <span style="font-size: 0.85rem; font-weight: bold;">{datos['porcentaje_abono']:.1f}%</span>
+                        </div>
                     </div>
-                </div>
-                """, unsafe_allow_html=True)
+                    """, unsafe_allow_html=True)
+
+    # Servicios sin facturación
+    servicios_sin_facturacion = [s for s in servicios.keys() if row[s] == 0]
+    if servicios_sin_facturacion:
+        st.info(f"**Servicios sin facturación:** {', '.join(servicios_sin_facturacion)}")
+
+    # -------------------- RESUMEN TOTAL POR SERVICIOS --------------------
+    perfil.seccion("Resumen por servicio")
+    st.markdown("---")
+    st.subheader("📊 Resumen de Rendimiento por Servicios")
+
+    # Crear DataFrame para el resumen
+    resumen_data = []
+    for servicio, datos in servicios_con_facturacion.items():
+        resumen_data.append({
+            'Servicio': servicio,
+            'Facturado (€)': datos['facturado'],
+            'Abonado (€)': datos['abonado'],
+            '% Abono': datos['porcentaje_abono']
+        })
+
+    if resumen_data:
+        df_resumen = pd.DataFrame(resumen_data)
+
+        # Mostrar tabla de resumen (formatos de columna, sin convertir cada importe a texto)
+        mostrar_tabla(df_resumen, {'Facturado (€)': 'euros', 'Abonado (€)': 'euros', '% Abono': 'porcentaje'},
+                      use_container_width=True, hide_index=True)
+
+        # Gráfico de rendimiento por servicio
+        def figura_servicios(df):
+            figura = px.bar(df, x='Servicio', y='Facturado (€)',
+                            title=f"Facturación por Servicio - Dr. {medico_sel}",
+                            text='Facturado (€)',
+                            color='Servicio')
+            figura.update_traces(texttemplate='%{text:,.0f} €', textposition='outside')
+            figura.update_layout(showlegend=False, xaxis_tickangle=-45)
+            return figura
+
+        fig_servicios = figura_cacheada(cache_figuras, 'servicios_medico', df_resumen, figura_servicios, medico_sel)
+        st.plotly_chart(fig_servicios, use_container_width=True)
+
+
+reporte_medico()
 
-# Servicios sin facturación
-servicios_sin_facturacion = [s for s in servicios.keys() if row[s] == 0]
-if servicios_sin_facturacion:
-    st.info(f"**Servicios sin facturación:** {', '.join(servicios_sin_facturacion)}")
+# -------------------- Gráfico comparativo por nivel jerárquico --------------------
+@st.fragment
+@perfil.fragmento
+def grafico_nivel():
+    perfil.seccion("Por nivel (gráfico)")
+    import plotly.express as px
+
+    st.markdown("---")
+    st.markdown("### 📊 Comparación de abonos por nivel jerárquico")
+    nivel_sel = st.selectbox("Seleccione nivel jerárquico para gráfico", list(niveles.keys()), key="nivel_grafico")
+    df_nivel = indice.nivel(nivel_sel)
+    conceptos = ["Total_Bruto", "Total_VITHAS", "Total_OSA_Disponible", "Abonado_a_Medico"]
+
+    # Con muchos médicos no se dibuja una barra por médico: N mayores + "Otros"
+    # o la distribución del nivel, calculadas aquí (tamaño de figura acotado)
+    modo_grafico = "Por médico"
+    if len(df_nivel) > UMBRAL_MEDICOS_GRAFICO:
+        modo_grafico = st.radio(
+            f"{len(df_nivel):,} médicos en el nivel: modo del gráfico",
+            [f"Top {TOP_MEDICOS} + otros", "Distribución"], horizontal=True, key="modo_grafico_nivel"
+        )
+
+    if modo_grafico == "Distribución":
+        import plotly.graph_objects as go
+
+        def figura_cajas(cajas):
+            figura = go.Figure(go.Box(
+                x=cajas["Concepto"], q1=cajas["q1"], median=cajas["mediana"], q3=cajas["q3"],
+                lowerfence=cajas["minimo"], upperfence=cajas["maximo"], marker_color="#2e7d32", name=nivel_sel
+            ))
+            figura.update_layout(title=f"Distribución de importes de los médicos del nivel {nivel_sel}",
+                                 yaxis_title="Valor (€)")
+            return figura
+
+        fig = figura_cacheada(cache_figuras, 'cajas_nivel', resumen_cajas(df_nivel, conceptos), figura_cajas, nivel_sel)
+        st.plotly_chart(fig, use_container_width=True)
+
+        concepto_hist = st.selectbox("Histograma de", conceptos, index=3, key="concepto_histograma_nivel")
+        def figura_histograma(df_hist):
+            figura = px.bar(df_hist, x="Centro", y="Médicos", title=f"{concepto_hist} de los médicos del nivel {nivel_sel}",
+                            hover_data={"Desde": ":,.0f", "Hasta": ":,.0f", "Centro": False})
+            figura.update_layout(bargap=0, xaxis_title=f"{concepto_hist} (€)")
+            return figura
+
+        fig_hist = figura_cacheada(cache_figuras, 'histograma_nivel', histograma(df_nivel[concepto_hist]),
+                                   figura_histograma, nivel_sel, concepto_hist)
+        st.plotly_chart(fig_hist, use_container_width=True)
+    else:
+        df_grafico = top_con_otros(df_nivel, conceptos) if modo_grafico != "Por médico" else df_nivel
+
+        def figura_nivel(df):
+            df_melt = df.melt(id_vars=["Médico"], value_vars=conceptos, var_name="Concepto", value_name="Valor (€)")
+            figura = px.bar(df_melt, x="Médico", y="Valor (€)", color="Concepto", barmode="group",
+                            title=f"Comparación de abonos de médicos del nivel {nivel_sel}", text="Valor (€)")
+            figura.update_traces(texttemplate='%{text:,.0f} €', textposition='inside')
+            return figura
+
+        fig = figura_cacheada(cache_figuras, 'abonos_nivel', df_grafico[["Médico"] + conceptos], figura_nivel, nivel_sel)
+        st.plotly_chart(fig, use_container_width=True)
+
+grafico_nivel()
+
+# -------------------- Informes de todos los médicos --------------------
+perfil.seccion("Informes")
+import io
+from motor import generar_informes, huella, pdf_disponible
 
-# -------------------- RESUMEN TOTAL POR SERVICIOS --------------------
 st.markdown("---")
-st.subheader("📊 Resumen de Rendimiento por Servicios")
-
-# Crear DataFrame para el resumen
-resumen_data = []
-for servicio, datos in servicios_con_facturacion.items():
-    resumen_data.append({
-        'Servicio': servicio,
-        'Facturado (€)': datos['facturado'],
-        'Abonado (€)': datos['abonado'],
-        '% Abono': datos['porcentaje_abono']
-    })
-
-if resumen_data:
-    df_resumen = pd.DataFrame(resumen_data)
-    
-    # Formatear números para mejor visualización
-    df_resumen_display = df_resumen.copy()
-    df_resumen_display['Facturado (€)'] = df_resumen_display['Facturado (€)'].apply(lambda x: f"{x:,.2f} €")
-    df_resumen_display['Abonado (€)'] = df_resumen_display['Abonado (€)'].apply(lambda x: f"{x:,.2f} €")
-    df_resumen_display['% Abono'] = df_resumen_display['% Abono'].apply(lambda x: f"{x:.1f}%")
-    
-    # Mostrar tabla de resumen
-    st.dataframe(df_resumen_display, use_container_width=True, hide_index=True)
-    
-    # Gráfico de rendimiento por servicio
-    fig_servicios = px.bar(df_resumen, x='Servicio', y='Facturado (€)', 
-                          title=f"Facturación por Servicio - Dr. {medico_sel}",
-                          text='Facturado (€)',
-                          color='Servicio')
-    fig_servicios.update_traces(texttemplate='%{text:,.0f} €', textposition='outside')
-    fig_servicios.update_layout(showlegend=False, xaxis_tickangle=-45)
-    st.plotly_chart(fig_servicios, use_container_width=True)
+st.markdown("### 📦 Informes de todos los médicos")
+st.caption("Genera el reporte de rendimiento de cada médico de la plantilla en paralelo y los descarga en un único zip.")
+
+with st.form("informes_medicos"):
+    con_pdf = st.checkbox("Incluir PDF", value=False, disabled=not pdf_disponible(),
+                          help="Requiere weasyprint instalado en el servidor" if not pdf_disponible() else None)
+    generar = st.form_submit_button("📄 Generar informes")
+
+# Se guarda el zip por huella de datos: volver a pulsar con los mismos importes no lo regenera
+cache_informes = cache_sesion(st.session_state, "cache_informes", max_entradas=2)
+clave_informes = huella(df_edit[["Médico", "Nivel"] + list(servicios)], servicios, config["reglas"], con_pdf)
+
+def generar_zip(barra=None):
+    destino = io.BytesIO()
+    progreso = None
+    if barra is not None:
+        progreso = lambda hechos, total: barra.progress(hechos / total, text=f"Informes generados: {hechos}/{total}")
+    generar_informes(df_edit, promedios_nivel, config["reglas"], servicios, destino, pdf=con_pdf, progreso=progreso)
+    return destino.getvalue()
+
+if generar:
+    barra = st.progress(0.0, text="Generando informes...")
+    cache_informes.obtener(clave_informes, lambda: generar_zip(barra))
+    barra.progress(1.0, text=f"✅ {len(indice)} informes listos")
+
+if clave_informes in cache_informes:
+    # Si la caché lo hubiera descartado entre medias se vuelve a generar (nunca un zip vacío)
+    st.download_button(
+        "📥 Descargar informes (zip)", data=cache_informes.obtener(clave_informes, generar_zip),
+        file_name="informes_medicos.zip", mime="application/zip"
+    )
+
+# -------------------- Simulación Monte Carlo del pool OSA --------------------
+perfil.seccion("Simulación")
+import plotly.express as px
+from motor import DISTRIBUCIONES, bandas_percentiles, simular_pool_osa
 
-# -------------------- Gráfico comparativo por nivel jerárquico --------------------
 st.markdown("---")
-st.markdown("### 📊 Comparación de abonos por nivel jerárquico")
-nivel_sel = st.selectbox("Seleccione nivel jerárquico para gráfico", list(niveles.keys()), key="nivel_grafico")
-df_nivel = df_edit[df_edit["Nivel"]==nivel_sel].copy()
-df_melt = df_nivel.melt(id_vars=["Médico"], value_vars=["Total_Bruto","Total_VITHAS","Total_OSA_Disponible","Abonado_a_Medico"],
-                        var_name="Concepto", value_name="Valor (€)")
-
-fig = px.bar(df_melt, x="Médico", y="Valor (€)", color="Concepto", barmode="group",
-             title=f"Comparación de abonos de médicos del nivel {nivel_sel}", text="Valor (€)")
-fig.update_traces(texttemplate='%{text:,.0f} €', textposition='inside')
-st.plotly_chart(fig, use_container_width=True)
+st.markdown("### 🎲 Simulación de escenarios (Monte Carlo)")
+st.caption("Genera miles de escenarios de facturación alrededor de los importes actuales y aplica las reglas de reparto a cada uno.")
+
+with st.form("simulacion_montecarlo"):
+    sim_cols = st.columns(3)
+    escenarios_sim = sim_cols[0].number_input("Número de escenarios", min_value=100, max_value=100_000, value=2000, step=500)
+    distribucion_sim = sim_cols[1].selectbox("Distribución", DISTRIBUCIONES)
+    cv_sim = sim_cols[2].slider("Variabilidad (coef. de variación)", 0.0, 1.0, 0.2, 0.05)
+    simular = st.form_submit_button("▶️ Ejecutar simulación")
+
+if simular:
+    if df_edit["Total_Bruto"].sum() == 0:
+        st.warning("⚠️ Introduzca importes de facturación para poder simular escenarios.")
+    else:
+        with st.spinner("Simulando escenarios..."):
+            simulacion = simular_pool_osa(
+                df_edit, servicios, config["reglas"], escenarios=int(escenarios_sim),
+                distribucion=distribucion_sim, cv=cv_sim, solo_positivos=True
+            )
+        prob_saldo_negativo = float((simulacion["saldo_osa"] < 0).mean())
+
+        sim_kpis = st.columns(3)
+        sim_kpis[0].metric("Probabilidad de saldo OSA negativo", f"{prob_saldo_negativo:.1%}")
+        sim_kpis[1].metric("Saldo OSA mediano", f"{np.median(simulacion['saldo_osa']):,.2f} €")
+        sim_kpis[2].metric("Total abonado mediano", f"{np.median(simulacion['total_abonado']):,.2f} €")
+
+        st.dataframe(
+            bandas_percentiles(simulacion).style.format("{:,.2f} €"),
+            use_container_width=True
+        )
+
+        df_sim = pd.DataFrame({"Saldo OSA (€)": simulacion["saldo_osa"]})
+        fig_sim = px.histogram(df_sim, x="Saldo OSA (€)", nbins=60, title="Distribución simulada del saldo OSA final")
+        fig_sim.add_vline(x=0, line_color="#e74c3c", line_dash="dash")
+        st.plotly_chart(fig_sim, use_container_width=True)
+
+        df_prom_sim = pd.DataFrame(simulacion["promedios"], columns=simulacion["niveles"]).melt(
+            var_name="Nivel", value_name="Promedio (€)"
+        )
+        fig_prom_sim = px.box(df_prom_sim, x="Nivel", y="Promedio (€)", color="Nivel",
+                              title="Promedios por nivel en los escenarios simulados")
+        fig_prom_sim.update_layout(showlegend=False)
+        st.plotly_chart(fig_prom_sim, use_container_width=True)
+
+panel_perfil(perfil)
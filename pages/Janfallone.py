@@ -1,11 +1,19 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from io import BytesIO
+import numpy as np
+
+from motor import (
+    ErrorConfiguracion, ErrorImportacion, MAX_FIGURAS, almacen_sesion, barrer_repartos, cache_sesion,
+    calcular_resultados, columnas_detalle, combinar_con_plantilla, configuracion, excel_bytes, figura_cacheada,
+    hojas_resultados, historial_sesion, huella, importar_facturacion, mostrar_tabla, pagina_tabla, panel_perfil,
+    perfil_sesion, periodo_actual, periodo_valido, plantilla_facturacion, resultados_incrementales
+)
 
 st.set_page_config(page_title="Distribución VITHAS-OSA", layout="wide", page_icon="💼")
 
+# Tiempos por sección de cada ejecución (panel "Perfil de ejecución" en la barra lateral)
+perfil = perfil_sesion(st.session_state, "janfallone")
+perfil.seccion("Configuración")
+
 # 2c3e50
 
 # -------------------- Estilos Profesionales --------------------
@@ -80,124 +88,171 @@ st.markdown('<div class="main-header">💼 Sistema de Distribución de Facturaci
 st.markdown("**Plataforma de gestión y análisis de distribución de ingresos médicos**")
 
 # -------------------- Definiciones: niveles y servicios --------------------
-niveles = {
-    "Especialista": ["Pons", "Sugrañes", "Mayo", "ME3", "ME4", "ME5", "ME6"],
-    "Consultor": ["Fallone", "Puigdellívol", "Aguilar", "Casaccia", "De Retana", "Ortega", "Barro", "Esteban", "MC4", "MC5", "MC6"]
-}
+# Compartidas por todas las páginas: config/distribucion.json
+try:
+    config = configuracion()
+except ErrorConfiguracion as e:
+    st.error(f"❌ {e}")
+    st.stop()
 
-servicios = {
-    "Consultas": {"VITHAS": 0.30, "OSA": 0.70},
-    "Quirúrgicas": {"VITHAS": 0.10, "OSA": 0.90},
-    "Urgencias": {"VITHAS": 0.50, "OSA": 0.50},
-    "Ecografías": {"VITHAS": 0.60, "OSA": 0.40},
-    "Prótesis y MQX": {"VITHAS": 0.00, "OSA": 1.00},
-    "Pacientes INTL": {"VITHAS": 0.40, "OSA": 0.60},
-    "Rehabilitación": {"VITHAS": 0.40, "OSA": 0.60},
-    "Podología": {"VITHAS": 0.30, "OSA": 0.70}
-}
-
-# Lista plana de médicos
-medicos = []
-for nivel, lista in niveles.items():
-    medicos.extend([(m, nivel) for m in lista])
+niveles = config['niveles']
+servicios = config['servicios']
+st.sidebar.caption(f"Configuración de reparto v{config['version']}")
 
 # -------------------- DataFrame base para st.data_editor --------------------
-cols = ["Médico", "Nivel"] + list(servicios.keys())
-rows = []
-for medico, nivel in medicos:
-    fila = {"Médico": medico, "Nivel": nivel}
-    for s in servicios.keys():
-        fila[s] = 0.0
-    rows.append(fila)
-
-df_base = pd.DataFrame(rows, columns=cols)
+df_base = plantilla_facturacion(config)
 
 # -------------------- Entrada de Datos --------------------
+perfil.seccion("Entrada")
 st.markdown('<div class="section-header">📋 Ingreso de Datos de Facturación</div>', unsafe_allow_html=True)
 st.info("Introduzca los importes de facturación para cada médico y servicio. Los cálculos se actualizarán automáticamente.")
 
-df_edit = st.data_editor(df_base, num_rows="fixed", use_container_width=True, height=400)
-
-# Asegurarnos de que las columnas de servicios sean numéricas
-for s in servicios.keys():
-    df_edit[s] = pd.to_numeric(df_edit[s], errors='coerce').fillna(0.0)
-
-# -------------------- Cálculos: totales por médico, por servicio y por nivel --------------------
-# Total bruto por médico (antes de separar VITHAS / OSA)
-df_edit['Total_Bruto'] = df_edit[list(servicios.keys())].sum(axis=1)
-
-# Totales por servicio (suma columnas)
-totales_por_servicio = {s: df_edit[s].sum() for s in servicios.keys()}
+# -------------------- Periodo de facturación --------------------
+# Cada mes guarda su matriz y sus resultados; editar un mes solo recalcula ese mes
+historial = historial_sesion(st.session_state)
+cache_resultados = cache_sesion(st.session_state, 'cache_resultados')
 
-# Totales VITHAS y OSA por servicio
-totales_vithas_por_servicio = {s: totales_por_servicio[s] * servicios[s]['VITHAS'] for s in servicios.keys()}
-totales_osa_por_servicio = {s: totales_por_servicio[s] * servicios[s]['OSA'] for s in servicios.keys()}
+ESQUEMA_PROMEDIO = "Promedio del nivel (actual)"
 
-# Totales generales
-total_bruto = df_edit['Total_Bruto'].sum()
-total_vithas = sum(totales_vithas_por_servicio.values())
-total_osa = sum(totales_osa_por_servicio.values())
+def registrar_periodo(periodo_destino, df_periodo, incremental=False):
+    # En modo incremental una edición de celda solo actualiza esa fila y el promedio de su nivel
+    # (solo con la regla del promedio en euros; los esquemas por percentiles y el
+    # cálculo al céntimo se recalculan completos)
+    tramos = config['esquemas_tramos'].get(esquema_abono)
+    if incremental and tramos is None and not importes_centimos:
+        calcular = lambda: resultados_incrementales(st.session_state, f'incremental_{periodo_destino}', df_periodo, servicios)
+    else:
+        calcular = lambda: calcular_resultados(df_periodo, servicios, tramos=tramos, centimos=importes_centimos)
+    clave = huella(df_periodo, servicios, niveles, esquema_abono, importes_centimos)
+    return clave, historial.registrar(periodo_destino, clave, lambda: cache_resultados.obtener(clave, calcular),
+                                      facturacion=df_periodo)
+
+with st.sidebar:
+    st.markdown("### 📅 Periodo")
+    nuevo_periodo = st.text_input("Añadir periodo (AAAA-MM)", placeholder=periodo_actual())
+    if nuevo_periodo:
+        if periodo_valido(nuevo_periodo):
+            historial.añadir(nuevo_periodo)
+        else:
+            st.error("Formato de periodo no válido, use AAAA-MM")
+    if not historial.periodos():
+        historial.añadir(periodo_actual())
+    periodos = historial.periodos()
+    periodo = st.selectbox("Periodo de facturación", periodos, index=len(periodos) - 1)
+    esquema_abono = st.selectbox(
+        "Esquema de abono", [ESQUEMA_PROMEDIO] + list(config['esquemas_tramos']),
+        help="Regla actual (encima/debajo del promedio) o tramos por percentiles del nivel"
+    )
+    modo_incremental = st.checkbox("Recálculo incremental al editar", value=True,
+                                   help="Actualiza solo el médico editado y el promedio de su nivel")
+    importes_centimos = st.checkbox("Importes exactos al céntimo", value=False,
+                                    help="Calcula en céntimos enteros: VITHAS + OSA y abonado + saldo cuadran al céntimo")
+
+# Meses guardados en disco por sesiones anteriores: se calculan una vez al abrir la sesión
+for periodo_guardado in historial.pendientes():
+    registrar_periodo(periodo_guardado, combinar_con_plantilla(df_base, historial.facturacion(periodo_guardado, servicios)))
+
+# Importación masiva: el fichero se lee por bloques y se agrega a la matriz médico × servicio
+with st.expander("📂 Importar facturación desde fichero (CSV, Excel o Parquet)"):
+    fichero_facturacion = st.file_uploader(
+        "Fichero con una línea por acto: médico, servicio, fecha e importe",
+        type=["csv", "xlsx", "parquet"]
+    )
+    separar_por_mes = st.checkbox("Separar por mes según la fecha de cada línea", value=True)
 
-# -------------------- Cálculo de OSA disponible por médico --------------------
-osa_por_medico = []
-for _, row in df_edit.iterrows():
-    total_osa_med = 0.0
-    for s in servicios.keys():
-        total_osa_med += row[s] * servicios[s]['OSA']
-    osa_por_medico.append(total_osa_med)
+# Versión del editor de cada periodo; sube cuando una importación reemplaza su matriz
+versiones_editor = st.session_state.setdefault('versiones_editor', {})
 
-df_edit['Total_OSA_Disponible'] = osa_por_medico
+if fichero_facturacion is not None:
+    cache_importacion = cache_sesion(st.session_state, 'cache_importacion', max_entradas=2)
 
-# Totales por nivel (brutos)
-totales_por_nivel = df_edit.groupby('Nivel')['Total_Bruto'].sum().to_dict()
+    def importar():
+        fichero_facturacion.seek(0)
+        return importar_facturacion(fichero_facturacion, servicios, niveles, nombre=fichero_facturacion.name,
+                                    por_periodo=separar_por_mes, alias_servicios=config['alias_servicios'])
 
-# Promedios por grupo (Especialistas y Consultores, usando bruto)
-promedio_especialistas = df_edit[df_edit['Nivel'] == 'Especialista']['Total_Bruto'].mean() if not df_edit[df_edit['Nivel'] == 'Especialista'].empty else 0.0
-promedio_consultores = df_edit[df_edit['Nivel'] == 'Consultor']['Total_Bruto'].mean() if not df_edit[df_edit['Nivel'] == 'Consultor'].empty else 0.0
-
-# -------------------- Aplicación de reglas de abono (sobre OSA disponible) --------------------
-pct_aplicado = []
-abonado = []
-por_osa_queda = []
-
-for _, row in df_edit.iterrows():
-    nivel = row['Nivel']
-    total_bruto_med = row['Total_Bruto']
-    total_osa_med = row['Total_OSA_Disponible']
-
-    if nivel == 'Especialista':
-        if total_bruto_med > promedio_especialistas:
-            pct = 0.90
-        else:
-            pct = 0.85
-    elif nivel == 'Consultor':
-        if total_bruto_med > promedio_consultores:
-            pct = 0.92
-        else:
-            pct = 0.88
+    try:
+        importado, informe_importacion = cache_importacion.obtener(
+            (fichero_facturacion.file_id, separar_por_mes), importar
+        )
+    except ErrorImportacion as e:
+        st.error(f"❌ No se pudo importar el fichero: {e}")
     else:
-        pct = 0.0
-
-    pagado = total_osa_med * pct
-    queda_osa = total_osa_med - pagado
+        # El fichero sigue en el cargador en cada reejecución: se aplica una sola
+        # vez para no pisar los meses editados después de importarlo
+        clave_importacion = (fichero_facturacion.file_id, separar_por_mes)
+        if st.session_state.get('importacion_aplicada') != clave_importacion:
+            st.session_state['importacion_aplicada'] = clave_importacion
+            # Solo se recalculan los periodos cuya matriz cambia con la importación
+            importados = importado if separar_por_mes else {periodo: importado}
+            for periodo_importado, df_importado in importados.items():
+                if periodo_valido(periodo_importado):
+                    registrar_periodo(periodo_importado, combinar_con_plantilla(df_base, df_importado))
+                    # Editor nuevo para ese periodo: las ediciones anteriores no se reaplican sobre lo importado
+                    versiones_editor[periodo_importado] = versiones_editor.get(periodo_importado, 0) + 1
+        st.success(
+            f"✅ Importadas {informe_importacion['filas']:,} líneas de {informe_importacion['medicos']} médicos "
+            f"({informe_importacion['importe_importado']:,.2f} €)."
+            + (f" Periodos: {', '.join(informe_importacion['periodos'])}." if separar_por_mes else "")
+        )
+        if informe_importacion['filas_ignoradas']:
+            motivos = {
+                'filas_servicio_desconocido': "servicio no definido",
+                'filas_sin_importe': "importe vacío o ilegible",
+                'filas_sin_medico': "sin médico",
+            }
+            detalle = ", ".join(f"{informe_importacion[k]:,} con {texto}" for k, texto in motivos.items()
+                                if informe_importacion[k])
+            st.warning(
+                f"⚠️ {informe_importacion['filas_ignoradas']:,} líneas se ignoraron ({detalle}; "
+                f"{informe_importacion['importe_ignorado']:,.2f} € legibles)."
+            )
+        if separar_por_mes and set(informe_importacion['periodos']) - set(historial.periodos()):
+            st.warning("⚠️ Algunas líneas no tienen una fecha válida y no se asignaron a ningún periodo.")
+
+# Matriz guardada del periodo (o plantilla vacía si aún no tiene datos)
+df_periodo = historial.facturacion(periodo, servicios)
+if df_periodo is None:
+    df_periodo = df_base
+
+st.caption(f"Periodo: **{periodo}**")
+df_edit = st.data_editor(df_periodo, num_rows="fixed", use_container_width=True, height=400,
+                         key=f"editor_{periodo}_{versiones_editor.get(periodo, 0)}")
+
+# -------------------- Cálculos: distribución VITHAS-OSA y abonos --------------------
+perfil.seccion("Cálculos")
+# Motor vectorizado; solo se recalcula si cambian los datos del periodo o las definiciones
+clave_resultados, resultados = registrar_periodo(periodo, df_edit, incremental=modo_incremental)
+# Distribución del periodo compartida con las demás páginas (sin copias; la
+# versión solo sube si cambian los datos)
+almacen_sesion(st.session_state).publicar(clave_resultados, resultados, servicios, origen=periodo)
+
+df_edit = resultados['df_edit']
+resumen = resultados['resumen']
+serv_df = resultados['serv_df']
+nivel_df = resultados['nivel_df']
 
-    pct_aplicado.append(pct)
-    abonado.append(pagado)
-    por_osa_queda.append(queda_osa)
-
-# Añadir columnas al DataFrame
-df_edit['Pct_Abono'] = pct_aplicado
-df_edit['Abonado_a_Medico'] = abonado
-df_edit['Queda_en_OSA_por_medico'] = por_osa_queda
+# Totales generales
+total_bruto = resumen['total_bruto']
+total_vithas = resumen['total_vithas']
+total_osa = resumen['total_osa']
 
-# Diferencia porcentual entre lo que facturó bruto y lo que recibió
-df_edit['Diferencia_%'] = (df_edit['Abonado_a_Medico'] / df_edit['Total_Bruto'] - 1).replace([float('inf'), -float('inf')], 0.0).fillna(0.0)
+# Promedios por grupo (Especialistas y Consultores, usando bruto)
+promedio_especialistas = resumen['promedios_nivel']['Especialista']
+promedio_consultores = resumen['promedios_nivel']['Consultor']
 
 # Totales resultantes de los abonos
-total_abonado_a_medicos = sum(abonado)
-osa_saldo_final = total_osa - total_abonado_a_medicos
+total_abonado_a_medicos = resumen['total_abonado_a_medicos']
+osa_saldo_final = resumen['osa_saldo_final']
+
+estadisticas_cache = cache_resultados.estadisticas()
+st.sidebar.caption(
+    f"Caché de resultados: {estadisticas_cache['aciertos']} aciertos / "
+    f"{estadisticas_cache['fallos']} fallos ({estadisticas_cache['entradas']}/{estadisticas_cache['max_entradas']} entradas)"
+)
 
 # -------------------- Resumen General --------------------
+perfil.seccion("Resumen")
 st.markdown('<div class="section-header">📊 Resumen General</div>', unsafe_allow_html=True)
 
 # Métricas principales
@@ -241,119 +296,171 @@ with col4:
     """.format(saldo_class, osa_saldo_final), unsafe_allow_html=True)
 
 # -------------------- Distribución por Servicio --------------------
-st.markdown('<div class="section-header">📈 Distribución por Servicio</div>', unsafe_allow_html=True)
+perfil.seccion("Por servicio")
+# Plotly se importa al llegar a los gráficos: la cabecera, el editor y las
+# tarjetas ya se han enviado al navegador mientras se carga
+import plotly.express as px
+import plotly.graph_objects as go
 
-serv_df = pd.DataFrame({
-    'Servicio': list(servicios.keys()),
-    'Facturación_Total': list(totales_por_servicio.values()),
-    'VITHAS': [totales_vithas_por_servicio[s] for s in servicios.keys()],
-    'OSA': [totales_osa_por_servicio[s] for s in servicios.keys()],
-    '% VITHAS': [servicios[s]['VITHAS'] * 100 for s in servicios.keys()],
-    '% OSA': [servicios[s]['OSA'] * 100 for s in servicios.keys()]
-})
+# Figuras guardadas por huella de sus datos: si no cambian no se reconstruyen
+cache_figuras = cache_sesion(st.session_state, 'cache_figuras', max_entradas=MAX_FIGURAS)
+
+st.markdown('<div class="section-header">📈 Distribución por Servicio</div>', unsafe_allow_html=True)
 
 tab1, tab2 = st.tabs(["📋 Tabla de Datos", "📊 Visualización"])
 
 with tab1:
-    st.dataframe(
-        serv_df.style.format({
-            "Facturación_Total": "{:,.2f} €",
-            "VITHAS": "{:,.2f} €", 
-            "OSA": "{:,.2f} €",
-            "% VITHAS": "{:.1f}%",
-            "% OSA": "{:.1f}%"
-        }),
+    mostrar_tabla(
+        serv_df,
+        {"Facturación_Total": "euros", "VITHAS": "euros", "OSA": "euros", "% VITHAS": "porcentaje", "% OSA": "porcentaje"},
         use_container_width=True
     )
 
+perfil.seccion("Por servicio (gráfico)")
 with tab2:
-    fig1 = go.Figure()
-    fig1.add_trace(go.Bar(
-        name='VITHAS',
-        x=serv_df['Servicio'],
-        y=serv_df['VITHAS'],
-        marker_color='#3498db',
-        text=serv_df['VITHAS'].apply(lambda x: f'{x:,.0f} €'),
-        textposition='auto'
-    ))
-    fig1.add_trace(go.Bar(
-        name='OSA',
-        x=serv_df['Servicio'],
-        y=serv_df['OSA'],
-        marker_color='#27ae60',
-        text=serv_df['OSA'].apply(lambda x: f'{x:,.0f} €'),
-        textposition='auto'
-    ))
-    fig1.update_layout(
-        title='Distribución VITHAS vs OSA por Servicio',
-        barmode='stack',
-        xaxis_tickangle=-45,
-        yaxis_title="Importe (€)"
-    )
+    def figura_servicios(df):
+        figura = go.Figure()
+        figura.add_trace(go.Bar(
+            name='VITHAS',
+            x=df['Servicio'],
+            y=df['VITHAS'],
+            marker_color='#3498db',
+            texttemplate='%{y:,.0f} €',
+            textposition='auto'
+        ))
+        figura.add_trace(go.Bar(
+            name='OSA',
+            x=df['Servicio'],
+            y=df['OSA'],
+            marker_color='#27ae60',
+            texttemplate='%{y:,.0f} €',
+            textposition='auto'
+        ))
+        figura.update_layout(
+            title='Distribución VITHAS vs OSA por Servicio',
+            barmode='stack',
+            xaxis_tickangle=-45,
+            yaxis_title="Importe (€)"
+        )
+        return figura
+
+    fig1 = figura_cacheada(cache_figuras, 'servicios', serv_df[['Servicio', 'VITHAS', 'OSA']], figura_servicios)
     st.plotly_chart(fig1, use_container_width=True)
 
 # -------------------- Totales por Nivel Jerárquico --------------------
+perfil.seccion("Por nivel")
 st.markdown('<div class="section-header">🏢 Totales por Nivel Jerárquico</div>', unsafe_allow_html=True)
 
-nivel_df = pd.DataFrame({
-    'Nivel': list(totales_por_nivel.keys()),
-    'Total_Bruto': list(totales_por_nivel.values()),
-    'Número de Médicos': [df_edit[df_edit['Nivel'] == nivel].shape[0] for nivel in totales_por_nivel.keys()],
-    'Promedio por Médico': [totales_por_nivel[nivel] / df_edit[df_edit['Nivel'] == nivel].shape[0] if df_edit[df_edit['Nivel'] == nivel].shape[0] > 0 else 0 for nivel in totales_por_nivel.keys()]
-})
-
 col1, col2 = st.columns([1, 1])
 
 with col1:
-    st.dataframe(
-        nivel_df.style.format({
-            "Total_Bruto": "{:,.2f} €",
-            "Promedio por Médico": "{:,.2f} €"
-        }),
+    mostrar_tabla(
+        nivel_df,
+        {"Total_Bruto": "euros", "Promedio por Médico": "euros"},
         use_container_width=True
     )
 
+perfil.seccion("Por nivel (gráfico)")
 with col2:
-    fig_niv = px.bar(nivel_df, x='Nivel', y='Total_Bruto', 
-                    title='Total Bruto por Nivel Jerárquico',
-                    color='Nivel',
-                    text_auto='.2s')
-    fig_niv.update_layout(
-        yaxis_title="Facturación Total (€)",
-        showlegend=False
-    )
-    fig_niv.update_traces(texttemplate='%{text:.2s} €', textposition='outside')
+    def figura_niveles(df):
+        figura = px.bar(df, x='Nivel', y='Total_Bruto',
+                        title='Total Bruto por Nivel Jerárquico',
+                        color='Nivel',
+                        text_auto='.2s')
+        figura.update_layout(
+            yaxis_title="Facturación Total (€)",
+            showlegend=False
+        )
+        figura.update_traces(texttemplate='%{text:.2s} €', textposition='outside')
+        return figura
+
+    fig_niv = figura_cacheada(cache_figuras, 'niveles', nivel_df[['Nivel', 'Total_Bruto']], figura_niveles)
     st.plotly_chart(fig_niv, use_container_width=True)
 
 # -------------------- Detalle por Médico --------------------
+perfil.seccion("Detalle")
 st.markdown('<div class="section-header">👨‍⚕️ Detalle por Médico</div>', unsafe_allow_html=True)
 
-cols_to_show = ['Médico', 'Nivel'] + list(servicios.keys()) + ['Total_Bruto', 'Total_OSA_Disponible', 'Pct_Abono', 'Abonado_a_Medico', 'Queda_en_OSA_por_medico', 'Diferencia_%']
+cols_to_show = columnas_detalle(df_edit, servicios)
+formatos_detalle = {
+    **{s: 'euros' for s in servicios.keys()},
+    'Total_Bruto': 'euros',
+    'Total_OSA_Disponible': 'euros',
+    'Pct_Abono': 'fraccion',
+    'Abonado_a_Medico': 'euros',
+    'Queda_en_OSA_por_medico': 'euros',
+    'Diferencia_%': 'diferencia'
+}
 
-# Función para color condicional
-def color_diferencia(val):
-    if val > 0:
-        return 'color: #27ae60; font-weight: bold;'
-    elif val < 0:
-        return 'color: #e74c3c; font-weight: bold;'
-    else:
-        return 'color: #7f8c8d;'
-
-st.dataframe(
-    df_edit[cols_to_show].sort_values(['Nivel', 'Médico']).reset_index(drop=True).style.format({
-        **{s: "{:,.2f} €" for s in servicios.keys()},
-        'Total_Bruto': "{:,.2f} €",
-        'Total_OSA_Disponible': "{:,.2f} €",
-        'Pct_Abono': "{:.1%}",
-        'Abonado_a_Medico': "{:,.2f} €",
-        'Queda_en_OSA_por_medico': "{:,.2f} €",
-        'Diferencia_%': "{:+.2%}"
-    }).applymap(color_diferencia, subset=['Diferencia_%']),
-    use_container_width=True,
-    height=400
+# Filtro, orden y paginación en el servidor: al navegador solo viaja la página visible
+filtro_cols = st.columns([2, 2, 2, 1, 1, 1])
+busqueda_medico = filtro_cols[0].text_input("Buscar médico", key="detalle_busqueda")
+niveles_detalle = filtro_cols[1].multiselect("Nivel", sorted(df_edit['Nivel'].astype(str).unique()), key="detalle_niveles")
+orden_detalle = filtro_cols[2].selectbox("Ordenar por", ['Nivel y Médico'] + cols_to_show, key="detalle_orden")
+descendente = filtro_cols[3].checkbox("Descendente", key="detalle_descendente")
+filas_por_pagina = filtro_cols[4].selectbox("Filas", [25, 50, 100, 250], index=1, key="detalle_filas")
+pagina_solicitada = filtro_cols[5].number_input("Página", min_value=1, value=1, step=1, key="detalle_pagina")
+
+pagina_detalle, filas_filtradas, total_paginas, pagina_detalle_num = pagina_tabla(
+    df_edit[cols_to_show],
+    busqueda=busqueda_medico,
+    filtros={'Nivel': niveles_detalle},
+    orden=['Nivel', 'Médico'] if orden_detalle == 'Nivel y Médico' else [orden_detalle],
+    ascendente=not descendente,
+    pagina=pagina_solicitada,
+    filas_por_pagina=filas_por_pagina
+)
+primera_fila = (pagina_detalle_num - 1) * filas_por_pagina
+st.caption(
+    f"Médicos {primera_fila + 1 if filas_filtradas else 0:,}–{primera_fila + len(pagina_detalle):,} "
+    f"de {filas_filtradas:,} · página {pagina_detalle_num} de {total_paginas}"
 )
 
+try:
+    from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
+except ImportError:
+    AgGrid = None
+
+if AgGrid is not None:
+    formato_euros = JsCode("""function(p) { return p.value == null ? '' :
+        p.value.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2}) + ' €'; }""")
+    formato_pct = JsCode("function(p) { return p.value == null ? '' : (p.value * 100).toFixed(1) + '%'; }")
+    formato_diferencia = JsCode("""function(p) { return p.value == null ? '' :
+        (p.value > 0 ? '+' : '') + (p.value * 100).toFixed(2) + '%'; }""")
+    color_diferencia = JsCode("""function(p) {
+        if (p.value > 0) { return {color: '#27ae60', fontWeight: 'bold'}; }
+        if (p.value < 0) { return {color: '#e74c3c', fontWeight: 'bold'}; }
+        return {color: '#7f8c8d'}; }""")
+
+    # Orden y filtro ya vienen del servidor: la rejilla solo pinta la página
+    opciones_grid = GridOptionsBuilder.from_dataframe(pagina_detalle)
+    opciones_grid.configure_default_column(sortable=False, filter=False, resizable=True)
+    opciones_grid.configure_grid_options(autoSizeStrategy={'type': 'fitCellContents'})
+    for col in cols_to_show:
+        if col in list(servicios.keys()) + ['Total_Bruto', 'Total_OSA_Disponible', 'Abonado_a_Medico', 'Queda_en_OSA_por_medico']:
+            opciones_grid.configure_column(col, type=['numericColumn'], valueFormatter=formato_euros)
+    opciones_grid.configure_column('Pct_Abono', type=['numericColumn'], valueFormatter=formato_pct)
+    opciones_grid.configure_column('Diferencia_%', type=['numericColumn'], valueFormatter=formato_diferencia,
+                                   cellStyle=color_diferencia)
+    AgGrid(
+        pagina_detalle,
+        gridOptions=opciones_grid.build(),
+        height=400,
+        allow_unsafe_jscode=True,
+        key="grid_detalle_medicos"
+    )
+else:
+    # Sin streamlit-aggrid: la misma página con st.dataframe
+    mostrar_tabla(
+        pagina_detalle.reset_index(drop=True),
+        formatos_detalle,
+        colorear=['Diferencia_%'],
+        use_container_width=True,
+        height=400
+    )
+
 # -------------------- Promedios por Grupo --------------------
+perfil.seccion("Promedios")
 st.markdown('<div class="section-header">📊 Promedios por Grupo</div>', unsafe_allow_html=True)
 
 c1, c2 = st.columns(2)
@@ -379,45 +486,112 @@ with c2:
 if total_abonado_a_medicos > total_osa:
     st.error("⚠️ Atención: El total abonado supera el pool OSA. Revisa los datos.")
 
+# -------------------- Evolución por Periodo --------------------
+perfil.seccion("Evolución")
+acumulados = historial.acumulados()
+if len(acumulados['evolucion']) > 1:
+    st.markdown('<div class="section-header">📅 Evolución por Periodo</div>', unsafe_allow_html=True)
+
+    tab_evolucion, tab_acumulado = st.tabs(["📈 Totales por Periodo", "👨‍⚕️ Acumulado por Médico"])
+
+    with tab_evolucion:
+        mostrar_tabla(
+            acumulados['evolucion'],
+            {c: 'euros' for c in acumulados['evolucion'].columns if c != 'Periodo'},
+            use_container_width=True,
+            hide_index=True
+        )
+        fig_evolucion = px.line(acumulados['evolucion'], x='Periodo', y=['Total_Bruto', 'Total_Abonado', 'Saldo_OSA'],
+                                markers=True, title='Evolución mensual')
+        fig_evolucion.update_layout(yaxis_title="Importe (€)", legend_title_text="")
+        st.plotly_chart(fig_evolucion, use_container_width=True)
+
+    with tab_acumulado:
+        mostrar_tabla(
+            acumulados['acumulado_medicos'],
+            {c: 'euros' for c in acumulados['acumulado_medicos'].columns if c not in ('Médico', 'Nivel')},
+            use_container_width=True,
+            hide_index=True,
+            height=400
+        )
+
+# -------------------- Sensibilidad de los repartos VITHAS/OSA --------------------
+perfil.seccion("Sensibilidad")
+with st.expander("🔬 Sensibilidad de los porcentajes VITHAS/OSA"):
+    st.caption("Evalúa, sobre la facturación actual, todas las combinaciones de % OSA de uno o dos servicios.")
+    with st.form("barrido_repartos"):
+        sens_cols = st.columns(2)
+        servicio_a = sens_cols[0].selectbox("Servicio", list(servicios.keys()), key="sens_servicio_a")
+        rango_a = sens_cols[0].slider("% OSA (rango)", 0, 100, (50, 100), key="sens_rango_a")
+        servicio_b = sens_cols[1].selectbox("Segundo servicio (opcional)", ["—"] + list(servicios.keys()), key="sens_servicio_b")
+        rango_b = sens_cols[1].slider("% OSA (rango)", 0, 100, (50, 100), key="sens_rango_b")
+        pasos = st.select_slider("Puntos por servicio", options=[11, 21, 51, 101, 201], value=51)
+        barrer = st.form_submit_button("▶️ Calcular barrido")
+
+    if barrer:
+        if servicio_b == servicio_a:
+            st.warning("⚠️ Elija dos servicios distintos.")
+        else:
+            valores_a = np.linspace(rango_a[0], rango_a[1], pasos) / 100
+            valores_b = np.linspace(rango_b[0], rango_b[1], pasos) / 100
+            segundo = None if servicio_b == "—" else servicio_b
+            barrido = barrer_repartos(df_edit, servicios, servicio_a, valores_a, segundo, valores_b if segundo else None)
+
+            if segundo:
+                fig_barrido = px.density_heatmap(
+                    barrido, x=f"% OSA {servicio_a}", y=f"% OSA {segundo}", z="Saldo_OSA",
+                    histfunc="avg", nbinsx=pasos, nbinsy=pasos, color_continuous_scale="RdYlGn",
+                    title=f"Saldo OSA final según % OSA de {servicio_a} y {segundo}"
+                )
+            else:
+                fig_barrido = px.line(
+                    barrido, x=f"% OSA {servicio_a}", y=["Total_VITHAS", "Total_OSA", "Total_Abonado", "Saldo_OSA"],
+                    title=f"Totales según % OSA de {servicio_a}"
+                )
+                fig_barrido.update_layout(yaxis_title="Importe (€)", legend_title_text="")
+            st.plotly_chart(fig_barrido, use_container_width=True)
+
+            mostrar_tabla(
+                barrido,
+                {
+                    **{c: 'porcentaje' for c in barrido.columns if c.startswith('% OSA')},
+                    'Total_VITHAS': 'euros',
+                    'Total_OSA': 'euros',
+                    'Total_Abonado': 'euros',
+                    'Saldo_OSA': 'euros'
+                },
+                use_container_width=True,
+                hide_index=True,
+                height=300
+            )
+
 # -------------------- Exportación --------------------
+perfil.seccion("Exportación")
 st.markdown('<div class="section-header">💾 Exportar Resultados</div>', unsafe_allow_html=True)
 
+# El libro solo se construye cuando se pulsa la descarga (en otro hilo) y se
+# guarda por huella de datos: descargas repetidas no lo vuelven a escribir
+cache_excel = cache_sesion(st.session_state, 'cache_excel', max_entradas=2)
+detalle_medicos = df_edit[cols_to_show]
+
 def generar_excel():
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        # Hoja de resumen global
-        hoja_totales_globales = pd.DataFrame({
-            'Concepto': ['Total Bruto', 'Total VITHAS', 'Total OSA (pool inicial)', 'Total abonado a médicos', 'Saldo OSA final'],
-            'Valor (€)': [total_bruto, total_vithas, total_osa, total_abonado_a_medicos, osa_saldo_final]
-        })
-        hoja_totales_globales.to_excel(writer, sheet_name='Totales_Globales', index=False)
-        
-        # Hoja por servicio
-        hoja_por_servicio = serv_df.copy()
-        hoja_por_servicio.to_excel(writer, sheet_name='Por_Servicio', index=False)
-        
-        # Hoja por nivel
-        hoja_por_nivel = nivel_df.copy()
-        hoja_por_nivel.to_excel(writer, sheet_name='Por_Nivel', index=False)
-        
-        # Hoja detalle médicos
-        hoja_detalle_medicos = df_edit[cols_to_show].copy()
-        hoja_detalle_medicos.to_excel(writer, sheet_name='Detalle_Medicos', index=False)
-    
-    return output.getvalue()
-
-excel_data = generar_excel()
+    return cache_excel.obtener(
+        clave_resultados,
+        lambda: excel_bytes(hojas_resultados(resumen, serv_df, nivel_df, detalle_medicos))
+    )
 
 #col1 = st.columns([1])
 #with col1:
 st.download_button(
     label="📥 Descargar Excel Completo",
-    data=excel_data,
-    file_name="distribucion_vithas_osa.xlsx",
+    data=perfil.medir("Excel (descarga)", generar_excel),
+    file_name=f"distribucion_vithas_osa_{periodo}.xlsx",
     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     use_container_width=True
 )
 
+panel_perfil(perfil)
+
 #with col2:
    # st.markdown("""
   #  <div class="info-box">
@@ -0,0 +1,144 @@
+"""Banco de pruebas de rendimiento con plantillas sintéticas.
+
+Uso:
+    python rendimiento.py                                  # 10 a 1.000.000 médicos
+    python rendimiento.py --tamanos 1000 100000 --repeticiones 5
+    python rendimiento.py --comparar                       # compara con la ejecución anterior
+
+Mide por separado el cálculo de la distribución, los promedios por nivel, la
+preparación de datos de gráficos (formato largo), el pintado de tablas (Styler
+y columnas declarativas) y la exportación a Excel. Cada ejecución se añade
+como una línea JSON a benchmarks/resultados.jsonl (historial local, fuera de
+git) o al fichero de --salida.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from motor import (
+    calcular_resultados, codigos_nivel, columnas_detalle, configuracion, excel_bytes, hojas_resultados,
+    plantilla_sintetica, promedios_por_nivel, tabla_columnas, tabla_styler
+)
+
+RUTA_RESULTADOS = Path(__file__).resolve().parent / "benchmarks" / "resultados.jsonl"
+TAMANOS = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+FORMATOS_DETALLE = {
+    'Total_Bruto': 'euros', 'Total_OSA_Disponible': 'euros', 'Pct_Abono': 'fraccion', 'Abonado_a_Medico': 'euros',
+    'Queda_en_OSA_por_medico': 'euros', 'Diferencia_%': 'diferencia'
+}
+
+
+def _medir(funcion, repeticiones):
+    # Mediana en ms de `repeticiones` llamadas, tras una de calentamiento
+    # (importaciones perezosas, cachés de pandas)
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def _datos_grafico(df_calc, servicios):
+    # Formato largo de los gráficos: médico × servicio y médico × concepto
+    por_servicio = df_calc.melt(id_vars=["Médico", "Nivel"], value_vars=list(servicios),
+                                var_name="Servicio", value_name="Facturación")
+    por_concepto = df_calc.melt(id_vars=["Médico"], value_vars=["Total_Bruto", "Total_VITHAS",
+                                                                 "Total_OSA_Disponible", "Abonado_a_Medico"],
+                                var_name="Concepto", value_name="Valor (€)")
+    return por_servicio, por_concepto
+
+
+def medir_tamano(n, config, repeticiones, max_styler, max_excel):
+    servicios = config["servicios"]
+    df = plantilla_sintetica(n, config)
+    resultados = calcular_resultados(df, servicios)
+    df_calc = resultados["df_edit"]
+    reglas = config["reglas"]
+
+    def promedios():
+        codigos = codigos_nivel(reglas, df_calc["Nivel"])
+        promedios_por_nivel(reglas, codigos, df_calc["Total_Bruto"].to_numpy())
+
+    detalle = df_calc[columnas_detalle(df_calc, servicios)]
+    formatos = {**{s: 'euros' for s in servicios}, **FORMATOS_DETALLE}
+    etapas = {
+        "distribucion": lambda: calcular_resultados(df, servicios),
+        "promedios_nivel": promedios,
+        "datos_grafico": lambda: _datos_grafico(df_calc, servicios),
+        "tabla_columnas": lambda: tabla_columnas(detalle, formatos, ['Diferencia_%']),
+    }
+    if n <= max_styler:
+        etapas["tabla_styler"] = lambda: tabla_styler(detalle, formatos, ['Diferencia_%']).to_html()
+    if n <= max_excel:
+        etapas["excel"] = lambda: excel_bytes(hojas_resultados(
+            resultados["resumen"], resultados["serv_df"], resultados["nivel_df"], detalle
+        ))
+    return {etapa: _medir(funcion, repeticiones) for etapa, funcion in etapas.items()}
+
+
+def _version_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _ultima_ejecucion(ruta):
+    if not ruta.exists():
+        return None
+    lineas = [l for l in ruta.read_text(encoding="utf-8").splitlines() if l.strip()]
+    return json.loads(lineas[-1]) if lineas else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rendimiento del motor con plantillas sintéticas")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS, help="Número de médicos por prueba")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por etapa (se toma la mediana)")
+    parser.add_argument("--max-styler", type=int, default=20_000, help="Tamaño máximo para medir Styler")
+    parser.add_argument("--max-excel", type=int, default=200_000, help="Tamaño máximo para medir la exportación")
+    parser.add_argument("--salida", type=Path, default=RUTA_RESULTADOS, help="Fichero JSON Lines de resultados")
+    parser.add_argument("--comparar", action="store_true", help="Comparar con la última ejecución guardada")
+    args = parser.parse_args(argv)
+
+    config = configuracion()
+    anterior = _ultima_ejecucion(args.salida) if args.comparar else None
+    ejecucion = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _version_codigo(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "repeticiones": args.repeticiones,
+        "resultados": {},
+    }
+    for n in args.tamanos:
+        tiempos = medir_tamano(n, config, args.repeticiones, args.max_styler, args.max_excel)
+        ejecucion["resultados"][str(n)] = tiempos
+        previos = (anterior or {}).get("resultados", {}).get(str(n), {})
+        print(f"{n:>10,} médicos")
+        for etapa, ms in tiempos.items():
+            comparacion = f"  ({ms / previos[etapa]:.2f}× anterior)" if previos.get(etapa) else ""
+            print(f"    {etapa:<16}{ms:>12,.1f} ms{comparacion}")
+
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.salida, "a", encoding="utf-8") as f:
+        f.write(json.dumps(ejecucion, ensure_ascii=False) + "\n")
+    print(f"\nResultados añadidos a {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from motor import DistribucionIncremental, a_centimos, calcular_distribucion, compilar_reglas, repartir
+
+SERVICIOS = {
+    "Consultas": {"VITHAS": 0.30, "OSA": 0.70},
+    "Quirúrgicas": {"VITHAS": 0.10, "OSA": 0.90},
+    "Urgencias": {"VITHAS": 0.50, "OSA": 0.50},
+    "Prótesis y MQX": {"VITHAS": 0.00, "OSA": 1.00},
+}
+PCT_ABONO = {"Especialista": (0.85, 0.90), "Consultor": (0.88, 0.92)}
+REGLAS = compilar_reglas(PCT_ABONO)
+
+
+def plantilla(n=300, semilla=7):
+    # Plantilla sintética: niveles con y sin regla, importes con céntimos y médicos sin facturar
+    rng = np.random.default_rng(semilla)
+    df = pd.DataFrame({
+        "Médico": [f"Dr. {i}" for i in range(n)],
+        "Nivel": rng.choice(["Especialista", "Consultor", "Residente"], n, p=[0.5, 0.4, 0.1]),
+    })
+    for s in SERVICIOS:
+        df[s] = np.round(rng.gamma(2.0, 800.0, n) * (rng.random(n) > 0.3), 2)
+    return df
+
+
+def distribucion_fila_a_fila(df):
+    # Cálculo original de la página: bucles por médico y media de pandas por nivel
+    df = df.copy()
+    df["Total_Bruto"] = df[list(SERVICIOS)].sum(axis=1)
+    osa = []
+    for _, row in df.iterrows():
+        total_osa_med = 0.0
+        for s in SERVICIOS:
+            total_osa_med += row[s] * SERVICIOS[s]["OSA"]
+        osa.append(total_osa_med)
+    df["Total_OSA_Disponible"] = osa
+    promedios = {n: df.loc[df["Nivel"] == n, "Total_Bruto"].mean() for n in PCT_ABONO}
+    pct = []
+    for _, row in df.iterrows():
+        if row["Nivel"] in PCT_ABONO:
+            debajo, encima = PCT_ABONO[row["Nivel"]]
+            pct.append(encima if row["Total_Bruto"] > promedios[row["Nivel"]] else debajo)
+        else:
+            pct.append(0.0)
+    df["Pct_Abono"] = pct
+    df["Abonado_a_Medico"] = df["Total_OSA_Disponible"] * df["Pct_Abono"]
+    df["Queda_en_OSA_por_medico"] = df["Total_OSA_Disponible"] - df["Abonado_a_Medico"]
+    return df, promedios
+
+
+def test_motor_vectorizado_igual_que_fila_a_fila():
+    df = plantilla()
+    esperado, promedios = distribucion_fila_a_fila(df)
+    out, resumen = calcular_distribucion(df, SERVICIOS, reglas=REGLAS)
+
+    np.testing.assert_array_equal(out["Pct_Abono"], esperado["Pct_Abono"])
+    for columna in ["Total_Bruto", "Total_OSA_Disponible", "Abonado_a_Medico", "Queda_en_OSA_por_medico"]:
+        np.testing.assert_allclose(out[columna], esperado[columna], rtol=1e-12, atol=1e-9)
+    for nivel, promedio in promedios.items():
+        assert resumen["promedios_nivel"][nivel] == pytest.approx(promedio, rel=1e-12)
+    assert resumen["total_abonado_a_medicos"] == pytest.approx(esperado["Abonado_a_Medico"].sum(), rel=1e-12)
+    assert resumen["total_bruto"] == pytest.approx(esperado["Total_Bruto"].sum(), rel=1e-12)
+
+
+def test_centimos_cuadran_con_el_total():
+    df = plantilla(semilla=11)
+    out, resumen = calcular_distribucion(df, SERVICIOS, reglas=REGLAS, centimos=True)
+    centimos = lambda columna: a_centimos(out[columna])
+
+    np.testing.assert_array_equal(centimos("Total_VITHAS") + centimos("Total_OSA_Disponible"), centimos("Total_Bruto"))
+    np.testing.assert_array_equal(
+        centimos("Abonado_a_Medico") + centimos("Queda_en_OSA_por_medico"), centimos("Total_OSA_Disponible")
+    )
+    assert a_centimos(resumen["total_vithas"]) + a_centimos(resumen["total_osa"]) == a_centimos(resumen["total_bruto"])
+    assert a_centimos(resumen["total_bruto"]) == a_centimos(df[list(SERVICIOS)].to_numpy()).sum()
+    assert (a_centimos(resumen["total_abonado_a_medicos"]) + a_centimos(resumen["osa_saldo_final"])
+            == a_centimos(resumen["total_osa"]))
+
+
+def test_repartir_redondea_mitades_en_enteros():
+    assert repartir(45, 0.70) == (32, 13)
+    assert repartir(-45, 0.70) == (-32, -13)
+    assert a_centimos(1.005) == 101
+    with pytest.raises(ValueError):
+        repartir(100, 1 / 3)
+
+
+def test_incremental_igual_que_recalculo_completo():
+    df = plantilla(n=200, semilla=3)
+    motor = DistribucionIncremental(df, SERVICIOS, reglas=REGLAS)
+    rng = np.random.default_rng(5)
+    for _ in range(50):
+        df.loc[rng.integers(len(df)), rng.choice(list(SERVICIOS))] = float(np.round(rng.gamma(2.0, 800.0), 2))
+        motor.aplicar_cambios(df)
+        resultados = motor.resultados()
+        esperado, resumen = calcular_distribucion(df, SERVICIOS, reglas=REGLAS)
+        np.testing.assert_array_equal(resultados["df_edit"]["Pct_Abono"], esperado["Pct_Abono"])
+        assert resultados["resumen"] == resumen
@@ -0,0 +1,40 @@
+"""Informe del tiempo de arranque en frío de la app (importaciones por página).
+
+Uso:
+    python tiempo_arranque.py                      # informe de app.py y pages/
+    python tiempo_arranque.py --comprobar          # además, sale con 1 si alguna página supera el presupuesto
+    python tiempo_arranque.py pages/Janfallone.py --presupuesto-ms 1200
+
+El presupuesto por defecto se puede cambiar con OSA_PRESUPUESTO_ARRANQUE_MS.
+"""
+import argparse
+import sys
+
+from motor.arranque import informe_arranque
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coste de importación en frío de cada página")
+    parser.add_argument("entradas", nargs="*", help="Scripts a medir (por defecto, app.py y pages/*.py)")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Arranques por página (se toma la mediana)")
+    parser.add_argument("--presupuesto-ms", type=float, default=None, help="Presupuesto de arranque por página")
+    parser.add_argument("--top", type=int, default=8, help="Módulos a mostrar por página")
+    parser.add_argument("--comprobar", action="store_true", help="Salir con código 1 si se supera el presupuesto")
+    args = parser.parse_args(argv)
+
+    informes, presupuesto = informe_arranque(args.entradas, args.repeticiones, args.presupuesto_ms)
+    for informe in informes:
+        estado = "✅" if informe["dentro_presupuesto"] else "❌"
+        print(f"{estado} {informe['entrada']}: {informe['total_ms']:,.0f} ms (presupuesto {presupuesto:,.0f} ms)")
+        for modulo in informe["modulos"][:args.top]:
+            print(f"    {modulo['acumulado_ms']:>9,.1f} ms  {modulo['modulo']}")
+
+    fuera = [i["entrada"] for i in informes if not i["dentro_presupuesto"]]
+    if args.comprobar and fuera:
+        print(f"\nArranque por encima del presupuesto: {', '.join(fuera)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())